@@ -354,7 +354,7 @@ class TwitchUserProfileAdmin(AdminAdvancedFilterMixin, admin.ModelAdmin):
     list_display = ('twitch_username', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('twitch_username',)
-    readonly_fields = ('id', 'twitch_username', 'created_at', 'view_all_chat_commands', 'total_xp')
+    readonly_fields = ('id', 'twitch_username', 'created_at', 'view_all_chat_commands', 'total_xp', 'completed_count')
     autocomplete_fields = ('completed_quests',)
     inlines = [ChatCommandLogInline]
 
@@ -370,6 +370,7 @@ class TwitchUserProfileAdmin(AdminAdvancedFilterMixin, admin.ModelAdmin):
         ('Quests', {
             'fields': (
                 'total_xp',
+                'completed_count',
                 'completed_quests',
             ),
         }),
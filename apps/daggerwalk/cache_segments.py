@@ -0,0 +1,375 @@
+from apps.daggerwalk.serializers import QuestSerializer, TwitchUserProfileSerializer
+from apps.daggerwalk.models import Quest, RegionVisitState, TwitchUserProfile, get_daggerwalk_data_versions
+from apps.daggerwalk.utils import get_latest_log_data
+from apps.daggerwalk.stats import refresh_stats_caches
+from apps.daggerwalk.map_logs import get_map_logs, simplify_map_logs
+from apps.daggerwalk.map_geometry import get_map_geometry
+from apps.daggerwalk.json_blobs import JSON_BLOB_CACHE_KEY, render_json, set_json_blob
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.db.models import F
+from django.core.cache import cache
+from uuid import uuid4
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+DAGGERWALK_HOME_HTML_CACHE_KEY = 'daggerwalk_home_html'
+DAGGERWALK_HOME_HTML_LAST_GOOD_CACHE_KEY = 'daggerwalk_home_html_last_good'
+DAGGERWALK_HOME_HTML_LOCK_KEY = 'daggerwalk_home_html_render_lock'
+DAGGERWALK_HOME_HTML_LOCK_TIMEOUT = 30
+DAGGERWALK_HOME_HTML_WAIT_SECONDS = 10  # How long a request with no stale copy waits for another worker's render
+SEGMENT_STATE_CACHE_KEY = 'daggerwalk_cache_segment'
+MAP_VERSIONS_CACHE_KEY = 'daggerwalk_map_versions'
+MAP_PARTS_CACHE_KEY = 'daggerwalk_map_parts'
+MAP_LOG_HISTORY_SIZE = 24  # Log versions whose kept ids are remembered, so a client holding one can be sent an append
+
+# Map refresh parts -> cache keys
+MAP_DATA_KEYS = {
+    'logs': 'daggerwalk_map_logs',
+    'quests': 'daggerwalk_map_quest',
+    'geometry': 'daggerwalk_map_geometry',  # URL of the current shapes/POIs blob
+}
+
+
+def get_map_versions():
+    state = cache.get(MAP_VERSIONS_CACHE_KEY)
+    return state['versions'] if state else {part: '' for part in MAP_DATA_KEYS}
+
+
+def get_map_etag(versions):
+    combined = '|'.join(versions[part] for part in MAP_DATA_KEYS)
+    return f'"{hashlib.sha1(combined.encode("utf-8")).hexdigest()[:16]}"'
+
+
+def build_region_data(full_rebuild=False):
+    # RegionVisitState holds each region's latest log, so this is a read of one row per region
+    region_data = (
+        RegionVisitState.objects
+        .values(
+            "region",
+            "region_fk__province",
+            latest_date=F("last_seen"),
+            latest_location=F("location"),
+            latest_weather=F("weather"),
+            latest_current_song=F("current_song"),
+        )
+        .order_by("-latest_date")
+    )
+    cache.set("daggerwalk_region_data", list(region_data), timeout=None)
+
+
+def build_latest_log(full_rebuild=False):
+    latest_log_data = get_latest_log_data()
+    body = render_json(latest_log_data)
+    cache.set("daggerwalk_latest_log_data", latest_log_data, timeout=None)
+    set_json_blob('latest_log', body)
+    return body
+
+
+def build_stats(full_rebuild=False):
+    refresh_stats_caches(full_rebuild=full_rebuild)
+
+
+def build_quests(full_rebuild=False):
+    current_quest = (
+        Quest.objects
+        .filter(status="in_progress")
+        .select_related("poi", "poi__region")
+        .order_by("-created_at")
+        .first()
+    )
+    cache.set("daggerwalk_current_quest", current_quest, timeout=None)
+
+    previous_quests = (
+        Quest.objects
+        .filter(status="completed")
+        .select_related("poi", "poi__region")
+        .order_by("-created_at")[:10]
+    )
+    cache.set("daggerwalk_previous_quests", previous_quests, timeout=None)
+
+
+def build_leaderboard(full_rebuild=False):
+    total_leaderboard_rows = 100
+    excluded_usernames = ["billcrystals", "daggerwalk", "daggerwalk_bot"]
+    # Reads the denormalized totals in leaderboard index order
+    leaders_qs = (
+        TwitchUserProfile.objects
+        .filter(total_xp__gt=0)
+        .exclude(twitch_username__in=excluded_usernames)
+        .order_by("-total_xp", "twitch_username")[:total_leaderboard_rows]
+    )
+    leaderboard_data = TwitchUserProfileSerializer(leaders_qs, many=True).data
+    cache.set("daggerwalk_leaderboard", leaderboard_data, timeout=None)
+
+
+def build_map_logs(full_rebuild=False):
+    cache.set("daggerwalk_map_logs", simplify_map_logs(get_map_logs()), timeout=None)
+
+
+def build_map_geometry(full_rebuild=False):
+    """
+    Caches the compact shapes/POIs blob and its content-hashed URL. The blob never changes under a URL,
+    so browsers and CDNs can keep it for good and only fetch again when the URL does.
+    """
+    body = render_json(get_map_geometry())
+    version = hashlib.sha1(body).hexdigest()[:16]
+    set_json_blob('geometry', body, etag=f'"{version}"')
+    url = reverse('daggerwalk_map_geometry', args=[version])
+    cache.set("daggerwalk_map_geometry", url, timeout=None)
+    return url
+
+
+def build_map_quest(full_rebuild=False):
+    quest_qs = Quest.objects.filter(status="in_progress").select_related("poi", "poi__region")
+    cache.set("daggerwalk_map_quest", QuestSerializer(quest_qs, many=True).data, timeout=None)
+
+
+def build_map_refresh(full_rebuild=False):
+    """
+    Pre-renders the map refresh responses from the map segments: the full payload as a JSON blob,
+    and each part's JSON (logs one item at a time) so deltas are assembled without serializing.
+    Simplification re-picks the kept logs on every build, so the kept ids of recent log versions are
+    kept too: an append is only correct if the client's logs match the server's up to since_id.
+    """
+    values = cache.get_many(list(MAP_DATA_KEYS.values()))
+    data = {part: values.get(key) or [] for part, key in MAP_DATA_KEYS.items()}
+
+    log_ids = [log['id'] for log in data['logs']]
+    log_items = [render_json(log) for log in data['logs']]
+    bodies = {part: render_json(data[part]) for part in MAP_DATA_KEYS if part != 'logs'}
+    bodies['logs'] = b'[' + b','.join(log_items) + b']'
+
+    versions = {part: hashlib.sha1(bodies[part]).hexdigest()[:16] for part in MAP_DATA_KEYS}
+    versions_json = render_json(versions)
+    etag = get_map_etag(versions)
+
+    log_history = (cache.get(MAP_PARTS_CACHE_KEY) or {}).get('log_history', {})
+    log_history.pop(versions['logs'], None)
+    log_history[versions['logs']] = log_ids
+    log_history = dict(list(log_history.items())[-MAP_LOG_HISTORY_SIZE:])
+    cache.set_many({
+        MAP_VERSIONS_CACHE_KEY: {'etag': etag, 'versions': versions, 'versions_json': versions_json},
+        MAP_PARTS_CACHE_KEY: {
+            'bodies': bodies, 'log_ids': log_ids, 'log_items': log_items, 'log_history': log_history,
+        },
+    }, timeout=None)
+
+    full = [b'"versions":' + versions_json]
+    full += [b'"' + part.encode() + b'":' + bodies[part] for part in MAP_DATA_KEYS]
+    full.append(b'"logs_mode":"replace"')
+    # Same ETag as the delta responses, so a client can revalidate either way
+    set_json_blob('map_refresh', b'{' + b','.join(full) + b'}', etag=etag)
+
+
+def build_home_data(full_rebuild=False):
+    set_json_blob('home_data', render_json({
+        "region_data": cache.get("daggerwalk_region_data") or [],
+        "latest_log_data": cache.get("daggerwalk_latest_log_data") or {},
+    }))
+
+
+def get_daggerwalk_home_context():
+    """Template context for daggerwalk/index.html, read from the cached segments."""
+    quest = cache.get("daggerwalk_current_quest")
+    quest_data = QuestSerializer(quest).data if quest else None
+    return {
+        "current_quest": quest,
+        "previous_quests": cache.get("daggerwalk_previous_quests") or [],
+        "current_quest_json": render_json(quest_data).decode("utf-8"),
+        "leaderboard": cache.get("daggerwalk_leaderboard") or [],
+        "logs_json": cache.get("daggerwalk_map_logs") or [],
+        "quest_json": cache.get("daggerwalk_map_quest") or [],
+        "geometry_url": cache.get("daggerwalk_map_geometry") or build_map_geometry(),
+        "map_versions": get_map_versions(),
+    }
+
+
+def home_html_inputs_built():
+    """Whether every segment the home page reads has been built since the cache was last emptied."""
+    inputs = CACHE_SEGMENTS['home_html']['inputs']
+    states = cache.get_many([f"{SEGMENT_STATE_CACHE_KEY}:{name}" for name in inputs])
+    return len(states) == len(inputs)
+
+
+def build_home_html(full_rebuild=False):
+    html = render_to_string('daggerwalk/index.html', get_daggerwalk_home_context())
+    values = {DAGGERWALK_HOME_HTML_CACHE_KEY: html}
+    # The last good copy is never invalidated, only replaced, so it can be served while the page is re-rendered.
+    # A page rendered with some of its segments missing doesn't replace it.
+    if home_html_inputs_built():
+        values[DAGGERWALK_HOME_HTML_LAST_GOOD_CACHE_KEY] = html
+    else:
+        logger.warning('Daggerwalk home HTML rendered with segments missing, keeping the last good copy')
+    cache.set_many(values, timeout=None)
+    return html
+
+
+def get_daggerwalk_home_html(on_miss=None):
+    """
+    The cached home page HTML. On a miss exactly one worker (under a lock) calls on_miss, which should queue a
+    cache rebuild, and everyone gets the last good copy straight away until that rebuild re-renders the page.
+    Only if there is no last good copy does that worker render the page itself, while the others wait for it.
+    Returns None if nothing turned up in time.
+    """
+    html = cache.get(DAGGERWALK_HOME_HTML_CACHE_KEY)
+    if html is not None:
+        return html
+
+    lock = cache.lock(DAGGERWALK_HOME_HTML_LOCK_KEY, timeout=DAGGERWALK_HOME_HTML_LOCK_TIMEOUT)
+    if lock.acquire(blocking=False):
+        try:
+            # Another worker may have finished rendering between the read and the lock
+            html = cache.get(DAGGERWALK_HOME_HTML_CACHE_KEY)
+            if html is None:
+                if on_miss:
+                    on_miss()
+                # The segments are likely empty too, so the rebuild re-renders the page once they're back
+                html = cache.get(DAGGERWALK_HOME_HTML_LAST_GOOD_CACHE_KEY)
+                if html is not None:
+                    logger.warning('Daggerwalk home HTML cache miss, serving the last good copy until the rebuild')
+                else:
+                    logger.warning('Daggerwalk home HTML cache miss with no last good copy, re-rendering')
+                    html = build_home_html()
+            return html
+        finally:
+            lock.release()
+
+    html = cache.get(DAGGERWALK_HOME_HTML_LAST_GOOD_CACHE_KEY)
+    if html is not None:
+        return html
+
+    deadline = time.monotonic() + DAGGERWALK_HOME_HTML_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        html = cache.get(DAGGERWALK_HOME_HTML_CACHE_KEY)
+        if html is not None:
+            return html
+    logger.error('Timed out waiting for the Daggerwalk home HTML to render')
+    return None
+
+
+# Each segment owns one or more cache keys and is rebuilt when:
+#   - one of the models in 'depends_on' changed since it was last built (see mark_daggerwalk_data_changed)
+#   - one of the segments in 'inputs' was rebuilt since it was last built
+#   - it's older than 'max_age' seconds (for segments that depend on the clock as well as the data)
+# Segments are refreshed in this order, so inputs must come before the segments that read them.
+CACHE_SEGMENTS = {
+    'region_data': {
+        'keys': ['daggerwalk_region_data'],
+        'depends_on': ['DaggerwalkLog', 'Region'],
+        'build': build_region_data,
+    },
+    'latest_log': {
+        'keys': ['daggerwalk_latest_log_data', f'{JSON_BLOB_CACHE_KEY}:latest_log'],
+        'depends_on': ['DaggerwalkLog', 'Region', 'POI'],
+        'build': build_latest_log,
+    },
+    'stats': {
+        'keys': ['daggerwalk_stats:*', f'{JSON_BLOB_CACHE_KEY}:stats:*'],
+        'depends_on': ['DaggerwalkLog', 'ChatCommandLog', 'Quest', 'TwitchUserProfile'],
+        'max_age': 60 * 60,  # today/yesterday roll over at midnight
+        'build': build_stats,
+    },
+    'quests': {
+        'keys': ['daggerwalk_current_quest', 'daggerwalk_previous_quests'],
+        'depends_on': ['Quest', 'POI', 'Region'],
+        'build': build_quests,
+    },
+    'leaderboard': {
+        'keys': ['daggerwalk_leaderboard'],
+        'depends_on': ['TwitchUserProfile', 'Quest'],
+        'build': build_leaderboard,
+    },
+    'map_logs': {
+        'keys': ['daggerwalk_map_logs'],
+        'depends_on': ['DaggerwalkLog', 'Region', 'POI'],
+        'max_age': 60 * 60,  # two week window
+        'build': build_map_logs,
+    },
+    'map_quest': {
+        'keys': ['daggerwalk_map_quest'],
+        'depends_on': ['Quest', 'POI', 'Region'],
+        'build': build_map_quest,
+    },
+    'map_geometry': {
+        'keys': ['daggerwalk_map_geometry', f'{JSON_BLOB_CACHE_KEY}:geometry'],
+        'depends_on': ['POI', 'Region', 'ProvinceShape'],
+        'build': build_map_geometry,
+    },
+    'map_refresh': {
+        'keys': [MAP_VERSIONS_CACHE_KEY, MAP_PARTS_CACHE_KEY, f'{JSON_BLOB_CACHE_KEY}:map_refresh'],
+        'inputs': ['map_logs', 'map_quest', 'map_geometry'],
+        'build': build_map_refresh,
+    },
+    'home_data': {
+        'keys': [f'{JSON_BLOB_CACHE_KEY}:home_data'],
+        'inputs': ['region_data', 'latest_log'],
+        'build': build_home_data,
+    },
+    'home_html': {
+        'keys': [DAGGERWALK_HOME_HTML_CACHE_KEY, DAGGERWALK_HOME_HTML_LAST_GOOD_CACHE_KEY],
+        'inputs': ['quests', 'leaderboard', 'map_logs', 'map_quest', 'map_geometry', 'map_refresh'],
+        'build': build_home_html,
+    },
+}
+
+
+def get_stale_reason(segment, state, versions, build_ids):
+    if state is None:
+        return "never built"
+    for model_name in segment.get('depends_on', []):
+        if state['versions'].get(model_name) != versions.get(model_name, 0):
+            return f"{model_name} changed"
+    for input_name in segment.get('inputs', []):
+        if state['inputs'].get(input_name) != build_ids.get(input_name):
+            return f"{input_name} rebuilt"
+    max_age = segment.get('max_age')
+    if max_age and time.time() - state['built_at'] > max_age:
+        return "expired"
+    return None
+
+
+def refresh_cache_segments(full_rebuild=False):
+    """
+    Rebuilds the cache segments whose dependencies changed since they were last built.
+    full_rebuild rebuilds every segment regardless.
+    Returns {segment name: reason} for the segments that were rebuilt.
+    """
+    names = list(CACHE_SEGMENTS)
+    states = cache.get_many([f"{SEGMENT_STATE_CACHE_KEY}:{name}" for name in names])
+    states = {name: states.get(f"{SEGMENT_STATE_CACHE_KEY}:{name}") for name in names}
+    build_ids = {name: state['build_id'] for name, state in states.items() if state}
+
+    model_names = {model_name for segment in CACHE_SEGMENTS.values() for model_name in segment.get('depends_on', [])}
+    # Read before building, so a change that lands mid-build still marks the segment stale next time
+    versions = get_daggerwalk_data_versions(model_names)
+
+    rebuilt = {}
+    for name, segment in CACHE_SEGMENTS.items():
+        reason = "full rebuild" if full_rebuild else get_stale_reason(segment, states[name], versions, build_ids)
+        if not reason:
+            continue
+
+        start = time.perf_counter()
+        try:
+            segment['build'](full_rebuild=full_rebuild)
+        except Exception as e:
+            logger.error(f"Daggerwalk cache segment {name} failed: {e}")
+            continue
+
+        build_ids[name] = uuid4().hex
+        cache.set(f"{SEGMENT_STATE_CACHE_KEY}:{name}", {
+            'build_id': build_ids[name],
+            'built_at': time.time(),
+            'versions': {model_name: versions.get(model_name, 0) for model_name in segment.get('depends_on', [])},
+            'inputs': {input_name: build_ids.get(input_name) for input_name in segment.get('inputs', [])},
+        }, timeout=None)
+        rebuilt[name] = reason
+        logger.info(f"Rebuilt Daggerwalk cache segment {name} ({reason}) in {time.perf_counter() - start:.2f}s")
+
+    return rebuilt
@@ -0,0 +1,269 @@
+from apps.daggerwalk.utils import (
+    extract_date_key,
+    get_stats_date_ranges,
+    summarize_daggerwalk_stats,
+)
+from datetime import datetime, timedelta, timezone as dt_timezone
+from array import array
+import numpy as np
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MISSING = -1  # Category code for values the row-based scan skips (no POI, no song, no date)
+
+
+def to_epoch_us(dt):
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_us(us):
+    return EPOCH + timedelta(microseconds=int(us))
+
+
+class Categories:
+    """Interns repeated values (region names, songs, weather...) as int32 codes."""
+
+    def __init__(self):
+        self.codes = {}
+        self.labels = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.labels)
+            self.labels.append(value)
+        return code
+
+    def counts(self, codes):
+        """
+        {label: count} for the given codes, in order of first appearance like the row-based scan.
+        Codes marked MISSING are left out.
+        """
+        values, first_index, counts = np.unique(codes, return_index=True, return_counts=True)
+        result = {}
+        for i in np.argsort(first_index, kind='stable'):
+            if values[i] != MISSING:
+                result[self.labels[values[i]]] = int(counts[i])
+        return result
+
+
+class ColumnarStatsHistory:
+    """
+    The stats history held as NumPy columns, built once per rebuild and sliced for every range.
+    Rows are appended one at a time (so the history can be streamed from the database) into compact
+    array buffers, then frozen into NumPy columns with finalize().
+    calculate() returns exactly what calculate_daggerwalk_stats returns for the same rows.
+    """
+
+    def __init__(self):
+        self.regions = Categories()
+        self.pois = Categories()
+        self.songs = Categories()
+        self.weather = Categories()
+        self.days = Categories()
+        self.seasons = Categories()
+        self.commands = Categories()
+        self.users = Categories()
+
+        # Logs, in created_at order
+        self.log_created_at = array('q')
+        self.log_x = array('d')
+        self.log_z = array('d')
+        self.log_region = array('i')
+        self.log_poi = array('i')
+        self.log_song = array('i')
+        self.log_weather = array('i')
+        self.log_day = array('i')
+        self.log_season = array('i')
+
+        # Chats, newest first
+        self.chat_log_created_at = array('q')
+        self.chat_timestamp = array('q')
+        self.chat_command = array('i')
+        self.chat_user = array('i')
+        self.chat_args = []
+        self.chat_raw = []
+
+        # Completed quests
+        self.quest_ids = array('q')
+        self.quest_completed_at = array('q')
+        self.quest_created_at = array('q')
+        self.quest_has_created_at = array('b')
+        self.quest_xp = array('q')
+
+    @classmethod
+    def from_rows(cls, all_logs, all_chats, all_quests, quest_walkers):
+        history = cls()
+        for log in all_logs:
+            history.append_log(log)
+        for chat in all_chats:
+            history.append_chat(chat)
+        for quest in all_quests:
+            history.append_quest(quest)
+        history.finalize(quest_walkers)
+        return history
+
+    def append_log(self, log):
+        """Logs must be appended in created_at order."""
+        self.log_created_at.append(to_epoch_us(log['created_at']))
+        self.log_x.append(float(log['player_x']))
+        self.log_z.append(float(log['player_z']))
+        self.log_region.append(self.regions.code(log['region']))
+        self.log_poi.append(
+            self.pois.code((log['poi__name'], log.get('region_fk__name'), log.get('poi__emoji')))
+            if log.get('poi__name') else MISSING
+        )
+        self.log_song.append(self.songs.code(log['current_song']) if log.get('current_song') else MISSING)
+        self.log_weather.append(self.weather.code(log['weather']))
+        # The in-game day key is all the stats ever read from a log's date string
+        self.log_day.append(self.days.code(extract_date_key(log['date'])) if log.get('date') else MISSING)
+        self.log_season.append(self.seasons.code(log.get('season')))
+
+    def append_chat(self, chat):
+        """Chats must be appended newest first."""
+        self.chat_log_created_at.append(to_epoch_us(chat['request_log__created_at']))
+        self.chat_timestamp.append(to_epoch_us(chat['timestamp']))
+        self.chat_command.append(self.commands.code(chat['command']))
+        self.chat_user.append(self.users.code(chat['user']))
+        self.chat_args.append(chat['args'])
+        self.chat_raw.append(chat['raw'])
+
+    def append_quest(self, quest):
+        if not quest.get('completed_at'):
+            return
+        self.quest_ids.append(quest['id'])
+        self.quest_completed_at.append(to_epoch_us(quest['completed_at']))
+        self.quest_created_at.append(to_epoch_us(quest['created_at']) if quest.get('created_at') else 0)
+        self.quest_has_created_at.append(bool(quest.get('created_at')))
+        self.quest_xp.append(quest.get('xp', 0))
+
+    def finalize(self, quest_walkers):
+        """Freezes the buffers into NumPy columns and builds the sorted indexes. quest_walkers maps quest id -> profile ids."""
+        self.log_created_at = np.frombuffer(self.log_created_at, np.int64)
+        for name in ('log_region', 'log_poi', 'log_song', 'log_weather', 'log_day', 'log_season'):
+            setattr(self, name, np.frombuffer(getattr(self, name), np.int32))
+
+        # step_km[i] is the distance walked between log i-1 and log i; the raw positions aren't needed after this
+        player_x = np.frombuffer(self.log_x, np.float64)
+        player_z = np.frombuffer(self.log_z, np.float64)
+        self.step_km = np.zeros(len(player_x), np.float64)
+        if len(player_x) > 1:
+            dx = np.diff(player_x)
+            dz = np.diff(player_z)
+            self.step_km[1:] = np.sqrt(dx * dx + dz * dz) / 1000.0
+        del self.log_x, self.log_z
+
+        self.chat_log_created_at = np.frombuffer(self.chat_log_created_at, np.int64)
+        self.chat_timestamp = np.frombuffer(self.chat_timestamp, np.int64)
+        self.chat_command = np.frombuffer(self.chat_command, np.int32)
+        self.chat_user = np.frombuffer(self.chat_user, np.int32)
+        # Sorted index over request log created_at, so each range is two binary searches
+        self.chat_order = np.argsort(self.chat_log_created_at, kind='stable')
+        self.chat_order_created_at = self.chat_log_created_at[self.chat_order]
+
+        # Quests sorted by completed_at
+        order = np.argsort(np.frombuffer(self.quest_completed_at, np.int64), kind='stable')
+        quest_ids = np.frombuffer(self.quest_ids, np.int64)[order]
+        self.quest_completed_at = np.frombuffer(self.quest_completed_at, np.int64)[order]
+        self.quest_created_at = np.frombuffer(self.quest_created_at, np.int64)[order]
+        self.quest_has_created_at = np.frombuffer(self.quest_has_created_at, np.int8)[order].astype(bool)
+        self.quest_xp = np.frombuffer(self.quest_xp, np.int64)[order]
+
+        # Participants flattened in quest order; quest i's walkers are walker_ids[walker_offsets[i]:walker_offsets[i + 1]]
+        walker_counts = np.fromiter((len(quest_walkers.get(int(q), ())) for q in quest_ids), np.int64, len(quest_ids))
+        self.walker_offsets = np.concatenate(([0], np.cumsum(walker_counts)))
+        self.walker_ids = np.fromiter(
+            (profile_id for q in quest_ids for profile_id in quest_walkers.get(int(q), ())),
+            np.int64, int(self.walker_offsets[-1])
+        )
+        return self
+
+    @staticmethod
+    def _slice(sorted_values, start_us, end_us):
+        """Index range of sorted_values within [start_us, end_us], inclusive on both ends."""
+        start = int(np.searchsorted(sorted_values, start_us, side='left'))
+        stop = int(np.searchsorted(sorted_values, end_us, side='right'))
+        return start, stop
+
+    def _log_entry(self, i):
+        day = self.log_day[i]
+        return {
+            'created_at': from_epoch_us(self.log_created_at[i]),
+            # extract_date_key() returns a day key unchanged, so it stands in for the full date string
+            'date': self.days.labels[day] if day != MISSING else None,
+            'season': self.seasons.labels[self.log_season[i]],
+        }
+
+    def _chat_row(self, i):
+        return {
+            'timestamp': from_epoch_us(self.chat_timestamp[i]),
+            'user': self.users.labels[self.chat_user[i]],
+            'command': self.commands.labels[self.chat_command[i]],
+            'args': self.chat_args[i],
+            'raw': self.chat_raw[i],
+        }
+
+    def _distance_km(self, start, stop):
+        if stop - start < 2:
+            return 0.0
+        # accumulate adds strictly left to right, matching the row-based running total
+        return float(np.add.accumulate(self.step_km[start + 1:stop])[-1])
+
+    def _region_data(self, start, stop):
+        codes = self.log_region[start:stop]
+        counts = self.regions.counts(codes)
+        # Logs are in created_at order, so a region was last seen at its last occurrence
+        values, reversed_index = np.unique(codes[::-1], return_index=True)
+        last_index = {self.regions.labels[v]: stop - 1 - i for v, i in zip(values, reversed_index)}
+        return {
+            region: {'count': count, 'last_seen': from_epoch_us(self.log_created_at[last_index[region]])}
+            for region, count in counts.items()
+        }
+
+    def calculate(self, range_keyword):
+        ranges = get_stats_date_ranges()
+        if range_keyword == 'all':
+            if not len(self.log_created_at):
+                raise ValueError('No logs available.')
+            start_datetime = from_epoch_us(self.log_created_at[0])
+            end_datetime = from_epoch_us(self.log_created_at[-1])
+        elif range_keyword in ranges:
+            start_datetime, end_datetime = ranges[range_keyword]
+        else:
+            raise ValueError(f'Invalid range: {range_keyword}. Must be one of: {", ".join(list(ranges) + ["all"])}')
+
+        start_us, end_us = to_epoch_us(start_datetime), to_epoch_us(end_datetime)
+
+        start, stop = self._slice(self.log_created_at, start_us, end_us)
+        total_logs = stop - start
+
+        # Chats are counted newest first, so put the window back in its original order
+        chat_start, chat_stop = self._slice(self.chat_order_created_at, start_us, end_us)
+        chat_index = np.sort(self.chat_order[chat_start:chat_stop])
+
+        quest_start, quest_stop = self._slice(self.quest_completed_at, start_us, end_us)
+        quest_count = quest_stop - quest_start
+        timed = self.quest_has_created_at[quest_start:quest_stop]
+        completed_at = self.quest_completed_at[quest_start:quest_stop][timed]
+        created_at = self.quest_created_at[quest_start:quest_stop][timed]
+        dur_minutes = ((completed_at - created_at) / 1e6 / 60).astype(np.int64)
+
+        return summarize_daggerwalk_stats(
+            start_datetime.date(), end_datetime.date(),
+            total_logs=total_logs,
+            total_distance_km=self._distance_km(start, stop),
+            first_entry=self._log_entry(start) if total_logs else None,
+            last_entry=self._log_entry(stop - 1) if total_logs else None,
+            region_data=self._region_data(start, stop),
+            poi_data=self.pois.counts(self.log_poi[start:stop]),
+            song_counts=self.songs.counts(self.log_song[start:stop]),
+            weather_counts=self.weather.counts(self.log_weather[start:stop]),
+            unique_days=set(np.unique(self.log_day[start:stop])) - {MISSING},
+            cmd_counts=self.commands.counts(self.chat_command[chat_index]),
+            user_counts=self.users.counts(self.chat_user[chat_index]),
+            last_100=[self._chat_row(i) for i in chat_index[:100]],
+            quest_count=quest_count,
+            quest_durations=(int(dur_minutes.sum()), len(dur_minutes)),
+            total_xp=int(self.quest_xp[quest_start:quest_stop].sum()),
+            walkers_with_xp=len(np.unique(self.walker_ids[self.walker_offsets[quest_start]:self.walker_offsets[quest_stop]])),
+        )
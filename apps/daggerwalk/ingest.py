@@ -0,0 +1,131 @@
+from apps.daggerwalk.models import (
+    ACTIVE_QUEST_CACHE_KEY,
+    ChatCommandLog,
+    DaggerwalkLog,
+    Quest,
+    TwitchUserProfile,
+    mark_daggerwalk_data_changed,
+)
+from apps.daggerwalk.serializers import QuestSerializer
+from django.utils.dateparse import parse_datetime
+from django.core.cache import cache
+from django.db.models.functions import Lower
+from django.db import transaction
+from functools import partial
+
+
+def parse_chat_logs(raw_chat_logs):
+    """
+    Parses 'timestamp | user | command | args...' lines from the bot into unsaved ChatCommandLog rows.
+    Lines without enough parts or a valid timestamp are skipped.
+    """
+    if isinstance(raw_chat_logs, str):
+        raw_chat_logs = raw_chat_logs.strip().splitlines()
+
+    chat_logs = []
+    for ln in raw_chat_logs:
+        parts = [p.strip() for p in ln.split("|")]
+        if len(parts) >= 3:
+            ts = parse_datetime(parts[0])
+            if ts:
+                chat_logs.append(ChatCommandLog(
+                    timestamp=ts,
+                    user=parts[1],
+                    command=parts[2],
+                    args=" ".join(parts[3:]) if len(parts) > 3 else "",
+                    raw=ln,
+                ))
+    return chat_logs
+
+
+def get_or_create_profile_ids(usernames):
+    """
+    Case-insensitive bulk get-or-create of TwitchUserProfiles.
+    Returns {username_lower: profile_id} in at most three queries, however many usernames are given.
+    New profiles keep the casing of the first occurrence of the name.
+    """
+    wanted = {}
+    for uname in usernames:
+        wanted.setdefault(uname.lower(), uname)
+    if not wanted:
+        return {}
+
+    def lookup():
+        return dict(
+            TwitchUserProfile.objects
+            .annotate(username_lower=Lower("twitch_username"))
+            .filter(username_lower__in=list(wanted))
+            .values_list("username_lower", "id")
+        )
+
+    profile_ids = lookup()
+    missing = [
+        TwitchUserProfile(twitch_username=uname)
+        for uname_lower, uname in wanted.items()
+        if uname_lower not in profile_ids
+    ]
+    if missing:
+        # ignore_conflicts leaves pks unset (and tolerates a concurrent insert), so look them up again
+        TwitchUserProfile.objects.bulk_create(missing, ignore_conflicts=True)
+        profile_ids = lookup()
+    return profile_ids
+
+
+def ingest_daggerwalk_log(data):
+    """
+    Creates a DaggerwalkLog and its chat command logs from a bot payload.
+    The region, POI and every chat profile are resolved in a fixed number of queries so the
+    write transaction doesn't grow with chat volume. Call inside transaction.atomic().
+    Raises KeyError for missing required fields before anything is written.
+    """
+    log_entry = DaggerwalkLog(
+        world_x=data['worldX'],
+        world_z=data['worldZ'],
+        map_pixel_x=data['mapPixelX'],
+        map_pixel_y=data['mapPixelY'],
+        region=data['region'],
+        location=data['location'],
+        player_x=data['playerX'],
+        player_y=data['playerY'],
+        player_z=data['playerZ'],
+        date=data['date'],
+        weather=data['weather'],
+        current_song=data.get('currentSong'),
+    )
+    chat_logs = parse_chat_logs(data.get("chat_logs") or [])
+
+    # DaggerwalkLog.save links Region/POI
+    log_entry.save()
+
+    if chat_logs:
+        profile_ids = get_or_create_profile_ids(chat.user for chat in chat_logs)
+        for chat in chat_logs:
+            chat.request_log = log_entry
+            chat.profile_id = profile_ids.get(chat.user.lower())
+        ChatCommandLog.objects.bulk_create(chat_logs)
+        transaction.on_commit(partial(mark_daggerwalk_data_changed, 'ChatCommandLog'))
+
+    return log_entry
+
+
+def get_active_quest():
+    """
+    The in-progress quest as {'id', 'poi_id', 'data'} (data is the serialized quest), all None if there isn't one.
+    Cached until a Quest, POI or Region changes, so checking a log for a quest completion takes no queries.
+    """
+    active_quest = cache.get(ACTIVE_QUEST_CACHE_KEY)
+    if active_quest is None:
+        quest = (
+            Quest.objects
+            .filter(status="in_progress", poi__isnull=False)
+            .select_related("poi", "poi__region")
+            .order_by("-created_at")
+            .first()
+        )
+        active_quest = {
+            'id': quest.id if quest else None,
+            'poi_id': quest.poi_id if quest else None,
+            'data': QuestSerializer(quest).data if quest else None,
+        }
+        cache.set(ACTIVE_QUEST_CACHE_KEY, active_quest, timeout=None)
+    return active_quest
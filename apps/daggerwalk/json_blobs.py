@@ -0,0 +1,63 @@
+from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse, HttpResponseNotModified
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+import hashlib
+import brotli
+import gzip
+
+
+JSON_BLOB_CACHE_KEY = 'daggerwalk_json'
+
+
+def render_json(data):
+    """The bytes DRF would send for data."""
+    return JSONRenderer().render(data)
+
+
+def get_etag(body):
+    return f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+
+def set_json_blob(name, body, etag=None):
+    """Caches a response body as-is plus gzip and brotli encoded copies, with an ETag (a hash of body by default)."""
+    cache.set(f"{JSON_BLOB_CACHE_KEY}:{name}", {
+        'etag': etag or get_etag(body),
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9),
+        'br': brotli.compress(body, mode=brotli.MODE_TEXT),
+    }, timeout=None)
+
+
+def get_accepted_encoding(request):
+    accepted = {
+        encoding.split(';')[0].strip()
+        for encoding in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    for encoding in ('br', 'gzip'):
+        if encoding in accepted:
+            return encoding
+    return 'identity'
+
+
+def json_blob_response(request, name):
+    """
+    Sends a cached JSON blob in one cache read, without decoding it.
+    Returns None if the blob hasn't been built so the caller can fall back to the slow path.
+    """
+    blob = cache.get(f"{JSON_BLOB_CACHE_KEY}:{name}")
+    if blob is None:
+        return None
+
+    if request.headers.get('If-None-Match') == blob['etag']:
+        response = HttpResponseNotModified()
+    else:
+        encoding = get_accepted_encoding(request)
+        response = HttpResponse(blob[encoding], content_type='application/json')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        response['Content-Length'] = len(blob[encoding])
+
+    response['ETag'] = blob['etag']
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,143 @@
+from apps.daggerwalk.cache_segments import build_latest_log
+from apps.daggerwalk.json_blobs import JSON_BLOB_CACHE_KEY
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+import redis.asyncio as aioredis
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+LATEST_LOG_CHANNEL = 'daggerwalk:latest_log'
+STREAM_HEARTBEAT_SECONDS = 15  # Keeps proxies from timing out idle viewers
+STREAM_MAX_SECONDS = 10 * 60  # Streams end after this and the browser reconnects, so half-open connections can't pile up
+STREAM_RETRY_MS = 3000
+VIEWER_QUEUE_SIZE = 4  # New logs come every few minutes, a viewer this far behind only needs the newest
+
+
+def format_event(event, data):
+    """An SSE frame. data must be a single line (compact JSON is)."""
+    return b'event: ' + event.encode() + b'\ndata: ' + data + b'\n\n'
+
+
+def publish_latest_log():
+    """
+    Refreshes the latest log cache and pushes it to every open live feed.
+    Called on commit of a new log, so viewers get it without waiting for the cache rebuild.
+    """
+    try:
+        body = build_latest_log()
+        get_redis_connection('default').publish(LATEST_LOG_CHANNEL, format_event('log', body))
+    except Exception as e:
+        logger.error(f"Error publishing latest Daggerwalk log: {e}")
+
+
+class LatestLogBroadcaster:
+    """
+    One Redis subscription per worker process, fanned out to an asyncio queue per viewer.
+    Frames are forwarded as published, so an idle viewer costs a queue and a parked coroutine.
+    """
+
+    def __init__(self):
+        self.queues = set()
+        self.listener = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=VIEWER_QUEUE_SIZE)
+        self.queues.add(queue)
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self.listen())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.queues.discard(queue)
+
+    def broadcast(self, frame):
+        for queue in self.queues:
+            if queue.full():
+                queue.get_nowait()  # Drop the oldest, the newest log is the one that matters
+            queue.put_nowait(frame)
+
+    async def listen(self):
+        while self.queues:
+            client = aioredis.from_url(settings.CACHES['default']['LOCATION'])
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(LATEST_LOG_CHANNEL)
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self.broadcast(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Daggerwalk live feed lost its Redis subscription: {e}")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.reset()
+                await client.close()
+
+
+broadcaster = LatestLogBroadcaster()
+
+
+async def stream_latest_log():
+    """
+    SSE stream for one viewer: the current latest log, then every new one as it's published,
+    with heartbeat comments in between.
+    """
+    queue = broadcaster.subscribe()
+    try:
+        yield f'retry: {STREAM_RETRY_MS}\n\n'.encode()
+        blob = await cache.aget(f"{JSON_BLOB_CACHE_KEY}:latest_log")
+        if blob:
+            yield format_event('log', blob['identity'])
+
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=min(STREAM_HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield b': ping\n\n'
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+async def latest_log_stream_app(scope, receive, send):
+    """
+    ASGI app for /daggerwalk/logs/stream/, mounted ahead of Django in kershner/asgi.py.
+    Django 4.2 doesn't notice when a streaming client goes away, so this listens for
+    http.disconnect itself and ends the viewer's stream straight away.
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    async def send_stream():
+        stream = stream_latest_log()
+        try:
+            async for frame in stream:
+                await send({'type': 'http.response.body', 'body': frame, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await stream.aclose()
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.create_task(send_stream()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.daggerwalk.map_logs import (
+    MAP_LOG_POINT_BUDGET,
+    MAP_LOG_TOLERANCE_PX,
+    get_map_log_anchors,
+    get_map_logs,
+    simplify_map_logs,
+)
+from datetime import timedelta
+import random
+import json
+import time
+
+
+def stride_sample_map_logs(logs_list, step=3):
+    """The previous sampler: every third log, plus the first, last and latest five."""
+    if len(logs_list) > 2:
+        latest_logs = logs_list[-5:]
+        remaining_logs = logs_list[:-5]
+        sampled = [remaining_logs[0]] + remaining_logs[1:-1:step] + [remaining_logs[-1]] if remaining_logs else []
+        return sampled + latest_logs
+    return logs_list
+
+
+def build_synthetic_map_logs(num_logs, seed=1):
+    """A random walk across the map, with stationary stretches, POI stops and region changes."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    x, y = 500.0, 250.0
+    region = 0
+    logs = []
+    for i in range(num_logs):
+        if rng.random() > 0.3:  # Stationary about a third of the time
+            x = min(max(x + rng.uniform(-2, 2), 0), 999)
+            y = min(max(y + rng.uniform(-2, 2), 0), 499)
+        if rng.random() < 0.01:
+            region += 1
+        poi = f"POI {i // 40}" if i % 40 < 3 else None
+        logs.append({
+            "id": i + 1, "map_pixel_x": int(x), "map_pixel_y": int(y),
+            "region": f"Region {region}", "location": poi or "Wilderness",
+            "weather": "Sunny", "season": "Summer", "current_song": "song",
+            "created_at": now - timedelta(minutes=5 * (num_logs - i)),
+            "date": "Loredas, 12 Sun's Dusk, 3E 406, 12:00:00",
+            "region_fk__name": f"Region {region}", "region_fk__province": "High Rock",
+            "region_fk__climate": "Woodlands", "region_fk__emoji": "🌲",
+            "poi__name": poi, "poi__emoji": "🏰" if poi else None, "poi__type": "town" if poi else None,
+        })
+    return logs
+
+
+class Command(BaseCommand):
+    help = "Compares the map log simplifier against the old stride-3 sampler (payload size and build time)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--synthetic",
+            type=int,
+            default=0,
+            help="Use this many synthetic logs instead of the last two weeks from the database."
+        )
+        parser.add_argument("--budget", type=int, default=MAP_LOG_POINT_BUDGET, help="Point budget.")
+        parser.add_argument("--tolerance", type=float, default=MAP_LOG_TOLERANCE_PX, help="Tolerance in map pixels.")
+        parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported).")
+
+    def handle(self, *args, **options):
+        if options["synthetic"]:
+            logs = build_synthetic_map_logs(options["synthetic"])
+            source = f"{len(logs):,} synthetic logs"
+        else:
+            start = time.perf_counter()
+            logs = get_map_logs()
+            source = f"{len(logs):,} logs from the last two weeks (query {time.perf_counter() - start:.3f}s)"
+        self.stdout.write(f"Input: {source}, {len(get_map_log_anchors(logs)) if len(logs) > 2 else len(logs):,} anchors\n")
+
+        samplers = {
+            "stride-3": lambda: stride_sample_map_logs(logs),
+            "simplified": lambda: simplify_map_logs(logs, options["budget"], options["tolerance"]),
+        }
+        for name, sampler in samplers.items():
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                result = sampler()
+                timings.append(time.perf_counter() - start)
+            payload = json.dumps(result, default=str).encode("utf-8")
+            self.stdout.write(
+                f"{name:<11} {len(result):>7,} points  {len(payload) / 1024:>9.1f} KB  {min(timings) * 1000:>8.2f} ms"
+            )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from apps.daggerwalk.screenshots import screenshotter
+from apps.daggerwalk.tasks import BASE_URL
+import tempfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Captures the Daggerwalk Bluesky screenshots several times in one process and reports how long "
+        "each step took. The first run includes the browser launch, later runs reuse the warm browser."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3, help="Captures to take.")
+        parser.add_argument("--base-url", default=BASE_URL, help="Site the page is loaded as.")
+        parser.add_argument("--output-dir", help="Keep the screenshots here (a temp dir by default).")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_dir = options["output_dir"] or temp_dir
+            results = []
+            try:
+                for run in range(options["runs"]):
+                    screenshotter.capture(options["base_url"], output_dir=output_dir)
+                    results.append(screenshotter.last_timings)
+                    self.stdout.write(
+                        f"Run {run + 1}: " + "  ".join(f"{name} {seconds:.2f}s" for name, seconds in results[-1].items())
+                    )
+            finally:
+                screenshotter.close()
+
+        if len(results) > 1:
+            warm = results[1:]
+            self.stdout.write(
+                "Warm average: " + "  ".join(
+                    f"{name} {sum(r[name] for r in warm) / len(warm):.2f}s" for name in warm[0]
+                )
+            )
@@ -0,0 +1,128 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.daggerwalk.columnar_stats import ColumnarStatsHistory
+from apps.daggerwalk.stats import STATS_RANGES
+from apps.daggerwalk.utils import calculate_daggerwalk_stats
+from datetime import timedelta
+from decimal import Decimal
+import random
+import time
+
+
+def build_synthetic_history(num_logs, num_chats, seed=1):
+    """
+    In-memory rows shaped like the stats history queries, one log every 5 minutes up to now.
+    Nothing is written to the database.
+    """
+    rng = random.Random(seed)
+    regions = [f"Region {i}" for i in range(60)]
+    pois = [(f"POI {i}", rng.choice(regions), "🏰") for i in range(400)]
+    songs = [None] + [f"song_{i}" for i in range(40)]
+    weather = ["Sunny", "Cloudy", "Overcast", "Fog", "Rain", "Thunder", "Snow"]
+    seasons = ["Winter", "Spring", "Summer", "Autumn"]
+    commands = ["left", "right", "forward", "back", "weather", "song", "map", "quest"]
+    users = [f"walker_{i}" for i in range(2000)]
+
+    now = timezone.now()
+    start = now - timedelta(minutes=5 * num_logs)
+    x = z = 0.0
+    all_logs = []
+    for i in range(num_logs):
+        x += rng.uniform(-500, 500)
+        z += rng.uniform(-500, 500)
+        poi = rng.choice(pois) if rng.random() < 0.1 else None
+        all_logs.append({
+            'id': i + 1,
+            'created_at': start + timedelta(minutes=5 * i),
+            'player_x': Decimal(f"{x:.6f}"),
+            'player_z': Decimal(f"{z:.6f}"),
+            'date': f"Loredas, {i // 288 % 30 + 1} Sun's Dusk, 3E {406 + i // 103680}, 12:00:00",
+            'season': seasons[i // 25920 % 4],
+            'region': poi[1] if poi else regions[i // 50 % len(regions)],
+            'weather': weather[i // 36 % len(weather)],
+            'current_song': songs[i // 12 % len(songs)],
+            'poi__name': poi[0] if poi else None,
+            'poi__emoji': poi[2] if poi else None,
+            'region_fk__name': poi[1] if poi else regions[i // 50 % len(regions)],
+        })
+
+    all_chats = []
+    for i in range(num_chats):
+        log = all_logs[rng.randrange(num_logs)]
+        command = rng.choice(commands)
+        user = rng.choice(users)
+        all_chats.append({
+            'id': i + 1,
+            'request_log__created_at': log['created_at'],
+            'timestamp': log['created_at'] - timedelta(seconds=rng.randrange(300)),
+            'user': user,
+            'command': command,
+            'args': "",
+            'raw': f"{log['created_at'].isoformat()} | {user} | {command}",
+        })
+    all_chats.sort(key=lambda c: c['timestamp'], reverse=True)
+
+    # A quest roughly every three hours
+    all_quests = [
+        {
+            'id': i + 1,
+            'created_at': start + timedelta(hours=3 * i),
+            'completed_at': start + timedelta(hours=3 * i + 2, minutes=rng.randrange(60)),
+            'xp': rng.randrange(5, 55, 5),
+        }
+        for i in range(num_logs * 5 // 180)
+    ]
+    quest_walkers = {
+        quest['id']: rng.sample(range(len(users)), rng.randrange(1, 12))
+        for quest in all_quests
+    }
+    return all_logs, all_chats, all_quests, quest_walkers
+
+
+class Command(BaseCommand):
+    help = "Times the Daggerwalk stats rebuild over a synthetic history (1M logs by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logs", type=int, default=1_000_000, help="Number of synthetic logs.")
+        parser.add_argument("--chats", type=int, default=200_000, help="Number of synthetic chat commands.")
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Also time the row-based calculate_daggerwalk_stats and check the outputs match."
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Building {options['logs']:,} synthetic logs and {options['chats']:,} chats...")
+        start = time.perf_counter()
+        all_logs, all_chats, all_quests, quest_walkers = build_synthetic_history(options["logs"], options["chats"])
+        self.stdout.write(f"  generated in {time.perf_counter() - start:.2f}s\n")
+
+        start = time.perf_counter()
+        history = ColumnarStatsHistory.from_rows(all_logs, all_chats, all_quests, quest_walkers)
+        load_seconds = time.perf_counter() - start
+        self.stdout.write(f"Columnar load: {load_seconds:.3f}s")
+
+        columnar = {}
+        for keyword in STATS_RANGES:
+            start = time.perf_counter()
+            columnar[keyword] = history.calculate(keyword)
+            self.stdout.write(
+                f"  {keyword:<12} {time.perf_counter() - start:.4f}s  ({columnar[keyword]['totalLogs']:,} logs)"
+            )
+
+        if not options["compare"]:
+            return
+
+        self.stdout.write("\nRow-based calculate_daggerwalk_stats:")
+        mismatched = []
+        for keyword in STATS_RANGES:
+            start = time.perf_counter()
+            row_based = calculate_daggerwalk_stats(keyword, all_logs, all_chats, all_quests, quest_walkers)
+            self.stdout.write(f"  {keyword:<12} {time.perf_counter() - start:.4f}s")
+            if row_based != columnar[keyword]:
+                mismatched.append(keyword)
+
+        if mismatched:
+            self.stdout.write(self.style.ERROR(f"\nOutputs differ for: {', '.join(mismatched)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("\nOutputs match for every range."))
@@ -0,0 +1,108 @@
+from django.core.management.base import BaseCommand, CommandError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from apps.daggerwalk.tasks import BLUESKY_VIDEO_MAX_BYTES, stream_video_to_bluesky
+from atproto import Client
+import threading
+import tracemalloc
+import resource
+import json
+import time
+
+MB = 1024 * 1024
+FAKE_BLOB_CID = "bafkreibme22gw2h7y2h7tg2fhqotaqjucnbc24deqo72b6mkl2egezxhvy"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves /clip/<bytes>.mp4 like the Twitch CDN and accepts uploadBlob like a PDS, discarding what it receives."""
+
+    chunk = b"\0" * MB
+    received = 0
+
+    def do_GET(self):
+        size = int(self.path.rsplit("/", 1)[-1].split(".")[0])
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        remaining = size
+        try:
+            while remaining:
+                n = min(remaining, len(self.chunk))
+                self.wfile.write(self.chunk[:n])
+                remaining -= n
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            data = self.rfile.read(min(remaining, MB))
+            if not data:
+                break
+            type(self).received += len(data)
+            remaining -= len(data)
+
+        body = json.dumps({"blob": {
+            "$type": "blob", "ref": {"$link": FAKE_BLOB_CID},
+            "mimeType": self.headers.get("Content-Type"), "size": type(self).received,
+        }}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams fake clips of increasing size through stream_video_to_bluesky against a local stand-in for "
+        "the Twitch CDN and the Bluesky PDS, and reports peak memory for each. Memory should stay flat as "
+        "the clip grows, and a clip over Bluesky's limit should be refused before it is downloaded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="5,20,45", help="Comma separated clip sizes in MB.")
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        client = Client(base_url=base_url)
+
+        peaks = []
+        try:
+            for size_mb in [float(size) for size in options["sizes"].split(",")]:
+                size = int(size_mb * MB)
+                StandInHandler.received = 0
+                tracemalloc.start()
+                start = time.perf_counter()
+                blob = stream_video_to_bluesky(client, f"{base_url}/clip/{size}.mp4")
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                peaks.append(peak)
+
+                if StandInHandler.received != size or blob.size != size:
+                    raise CommandError(f"Uploaded {StandInHandler.received} bytes of a {size} byte clip")
+                self.stdout.write(
+                    f"{size_mb:g} MB clip: {elapsed:.2f}s, peak Python memory {peak / MB:.1f} MB, "
+                    f"process max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB"
+                )
+
+            StandInHandler.received = 0
+            too_large = BLUESKY_VIDEO_MAX_BYTES + MB
+            try:
+                stream_video_to_bluesky(client, f"{base_url}/clip/{too_large}.mp4")
+            except Exception as e:
+                self.stdout.write(f"{too_large / MB:g} MB clip refused ({e}), {StandInHandler.received} bytes uploaded")
+            else:
+                raise CommandError("Oversized clip was uploaded")
+        finally:
+            server.shutdown()
+
+        if max(peaks) > 4 * min(peaks):
+            raise CommandError("Peak memory grew with the clip size")
+        self.stdout.write(self.style.SUCCESS("Peak memory stayed flat across clip sizes"))
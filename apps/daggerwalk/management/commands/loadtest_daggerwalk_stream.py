@@ -0,0 +1,138 @@
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+from apps.daggerwalk.live import LATEST_LOG_CHANNEL, format_event
+from urllib.parse import urlsplit
+import statistics
+import resource
+import asyncio
+import time
+import ssl
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Viewer:
+    """One SSE connection that records when each loadtest event arrives."""
+
+    def __init__(self, url, host):
+        self.url = urlsplit(url)
+        self.host = host or self.url.hostname
+        self.connect_seconds = None
+        self.received = {}  # Event number -> latency in seconds
+        self.error = None
+
+    async def run(self, ready):
+        port = self.url.port or (443 if self.url.scheme == 'https' else 80)
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(
+                self.url.hostname, port, ssl=ssl.create_default_context() if self.url.scheme == 'https' else None
+            )
+            writer.write(
+                f"GET {self.url.path or '/'} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Accept: text/event-stream\r\nConnection: keep-alive\r\n\r\n".encode()
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+            if b' 200 ' not in status_line:
+                raise ConnectionError(status_line.decode(errors='replace').strip() or 'no response')
+            self.connect_seconds = time.perf_counter() - start
+        except Exception as e:
+            self.error = str(e)
+            ready.set_result(False)
+            return
+        ready.set_result(True)
+
+        event = None
+        try:
+            while line := await reader.readline():
+                line = line.strip()
+                if line.startswith(b'event: '):
+                    event = line[7:]
+                elif line.startswith(b'data: ') and event == b'loadtest':
+                    number, sent_at = line[6:].split(b':')
+                    self.received[int(number)] = time.time() - float(sent_at)
+                elif not line:
+                    event = None
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Opens many concurrent viewers on the Daggerwalk live feed, publishes test events "
+        "and reports how many viewers got them and how fast. Point it at one ASGI worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8001/daggerwalk/logs/stream/", help="Stream URL.")
+        parser.add_argument("--host", default="kershner.org", help="Host header to send.")
+        parser.add_argument("--viewers", type=int, default=1000, help="Concurrent viewers to open.")
+        parser.add_argument("--batch", type=int, default=200, help="Viewers to connect at a time while ramping up.")
+        parser.add_argument("--events", type=int, default=5, help="Test events to publish once everyone is connected.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between test events.")
+
+    def handle(self, *args, **options):
+        # Every viewer is a socket
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = min(hard, options["viewers"] + 256)
+        if soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+            self.stdout.write(f"Raised the open file limit from {soft} to {wanted}")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        viewers = [Viewer(options["url"], options["host"]) for _ in range(options["viewers"])]
+        tasks = []
+        start = time.perf_counter()
+        for i in range(0, len(viewers), options["batch"]):
+            readies = []
+            for viewer in viewers[i:i + options["batch"]]:
+                ready = asyncio.get_running_loop().create_future()
+                tasks.append(asyncio.create_task(viewer.run(ready)))
+                readies.append(ready)
+            await asyncio.gather(*readies)
+
+        connected = [v for v in viewers if v.error is None]
+        failed = len(viewers) - len(connected)
+        connect_times = [v.connect_seconds for v in connected]
+        self.stdout.write(
+            f"Connected {len(connected):,} of {len(viewers):,} viewers in {time.perf_counter() - start:.2f}s "
+            f"(connect p50 {percentile(connect_times, 50) * 1000:.1f} ms, p95 {percentile(connect_times, 95) * 1000:.1f} ms)"
+        )
+        if failed:
+            errors = {}
+            for viewer in viewers:
+                if viewer.error is not None:
+                    errors[viewer.error] = errors.get(viewer.error, 0) + 1
+            for error, count in errors.items():
+                self.stdout.write(self.style.ERROR(f"  {count:,} x {error}"))
+
+        # Test events go through the same channel as new logs; browsers ignore the event type
+        redis_connection = get_redis_connection("default")
+        for number in range(options["events"]):
+            await asyncio.sleep(options["interval"])
+            redis_connection.publish(LATEST_LOG_CHANNEL, format_event('loadtest', f"{number}:{time.time()}".encode()))
+        await asyncio.sleep(max(options["interval"], 1.0))
+
+        for number in range(options["events"]):
+            latencies = [v.received[number] for v in connected if number in v.received]
+            self.stdout.write(
+                f"Event {number + 1}: delivered to {len(latencies):,}/{len(connected):,}  "
+                f"p50 {percentile(latencies, 50) * 1000:.1f} ms  p95 {percentile(latencies, 95) * 1000:.1f} ms  "
+                f"max {max(latencies, default=0) * 1000:.1f} ms"
+            )
+        all_latencies = [latency for v in connected for latency in v.received.values()]
+        if all_latencies:
+            self.stdout.write(f"Mean delivery latency {statistics.mean(all_latencies) * 1000:.1f} ms")
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
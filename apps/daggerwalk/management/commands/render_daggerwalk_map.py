@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from apps.daggerwalk.map_render import render_map_image
+import tracemalloc
+import time
+
+
+class Command(BaseCommand):
+    help = "Renders the Daggerwalk Bluesky map image with Pillow and reports how long it took and the memory it used."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default="world_map.png", help="PNG to write.")
+        parser.add_argument("--runs", type=int, default=3, help="Renders to time (the first loads the source images).")
+        parser.add_argument("--zoom", type=int, default=2, help="Leaflet zoom level to frame the logs at.")
+        parser.add_argument("--outlines", action="store_true", help="Draw the region outlines as well.")
+
+    def handle(self, *args, **options):
+        for run in range(options["runs"]):
+            tracemalloc.start()
+            start = time.perf_counter()
+            image = render_map_image(options["output"], zoom=options["zoom"], outlines=options["outlines"])
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(
+                f"Run {run + 1}: {image.width}x{image.height} in {elapsed * 1000:.0f} ms, "
+                f"peak Python memory {peak / 1024 / 1024:.1f} MB"
+            )
+        self.stdout.write(f"Saved {options['output']}")
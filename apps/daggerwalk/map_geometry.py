@@ -0,0 +1,72 @@
+from apps.daggerwalk.models import POI, ProvinceShape, Region
+from rest_framework.fields import DateTimeField
+
+
+GEOMETRY_STEPS = 10000  # Shape coordinates are snapped to this many steps across their widest side, ~0.1px on the map
+REGION_FIELDS = ("name", "province", "climate", "emoji")
+POI_FIELDS = ("id", "name", "type", "map_pixel_x", "map_pixel_y", "emoji", "description", "discovered", "region")
+
+
+def encode_polyline(values):
+    """Google polyline encoding of a list of ints: zigzag, then 5 bits per printable character."""
+    chars = []
+    for value in values:
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+def get_quantizer(coordinate_lists):
+    """(origin, step) for snapping every [x, y] in coordinate_lists to an integer grid."""
+    xs = [x for coordinates in coordinate_lists for x, _ in coordinates]
+    ys = [y for coordinates in coordinate_lists for _, y in coordinates]
+    if not xs:
+        return [0, 0], 1
+    span = max(max(xs) - min(xs), max(ys) - min(ys))
+    return [min(xs), min(ys)], (span / GEOMETRY_STEPS) or 1
+
+
+def encode_shape(coordinates, origin, step):
+    """A shape's points as one polyline string of interleaved x/y deltas on the quantized grid."""
+    deltas, prev_x, prev_y = [], 0, 0
+    for x, y in coordinates:
+        qx, qy = round((x - origin[0]) / step), round((y - origin[1]) / step)
+        deltas += [qx - prev_x, qy - prev_y]
+        prev_x, prev_y = qx, qy
+    return encode_polyline(deltas)
+
+
+def get_map_geometry():
+    """
+    The region shapes and POIs for the map in a compact form that map.js expands:
+      - regions: one row per region, in REGION_FIELDS order
+      - shapes: [region index, polyline of quantized x/y deltas], decoded as origin + value * step
+      - pois: one row per POI in POI_FIELDS order, with region as an index into regions
+    """
+    shapes = list(ProvinceShape.objects.order_by("region_id"))
+    pois = list(POI.objects.order_by("id"))
+    region_ids = sorted({shape.region_id for shape in shapes} | {poi.region_id for poi in pois})
+    regions = Region.objects.in_bulk(region_ids)
+    region_index = {region_id: i for i, region_id in enumerate(region_ids)}
+
+    origin, step = get_quantizer([shape.coordinates for shape in shapes])
+    discovered = DateTimeField()
+    return {
+        "origin": origin,
+        "step": step,
+        "region_fields": REGION_FIELDS,
+        "regions": [[getattr(regions[region_id], field) for field in REGION_FIELDS] for region_id in region_ids],
+        "shapes": [[region_index[shape.region_id], encode_shape(shape.coordinates, origin, step)] for shape in shapes],
+        "poi_fields": POI_FIELDS,
+        "pois": [
+            [
+                poi.id, poi.name, poi.type, poi.map_pixel_x, poi.map_pixel_y, poi.emoji, poi.description,
+                discovered.to_representation(poi.discovered) if poi.discovered else None,
+                region_index[poi.region_id],
+            ]
+            for poi in pois
+        ],
+    }
@@ -0,0 +1,95 @@
+from apps.daggerwalk.models import DaggerwalkLog
+from django.utils import timezone
+from datetime import timedelta
+import numpy as np
+import heapq
+
+
+MAP_LOG_WINDOW = timedelta(weeks=2)
+MAP_LOG_POINT_BUDGET = 1000  # Anchors (POI visits, region changes, latest logs) are kept even past this
+MAP_LOG_TOLERANCE_PX = 2.0  # Points closer than this to the simplified path are never worth keeping
+MAP_LOG_KEEP_LATEST = 5
+
+MAP_LOG_FIELDS = (
+    "id", "map_pixel_x", "map_pixel_y",
+    "region", "location", "weather", "season", "current_song", "created_at",
+    "date", "created_at",
+    "region_fk__name", "region_fk__province", "region_fk__climate", "region_fk__emoji",
+    "poi__name", "poi__emoji", "poi__type"
+)
+
+
+def get_map_logs(since=None):
+    """Map log rows (with related fields) from the last two weeks, oldest first."""
+    since = since or timezone.now() - MAP_LOG_WINDOW
+    return list(
+        DaggerwalkLog.objects
+        .filter(created_at__gte=since)
+        .select_related("region_fk", "poi")
+        .values(*MAP_LOG_FIELDS)
+        .order_by("id")
+    )
+
+
+def get_map_log_anchors(logs, keep_latest=MAP_LOG_KEEP_LATEST):
+    """Indexes that must survive simplification: the ends, the latest logs, POI visits and region changes."""
+    anchors = {0, len(logs) - 1}
+    anchors.update(range(max(0, len(logs) - keep_latest), len(logs)))
+    for i in range(1, len(logs)):
+        prev, log = logs[i - 1], logs[i]
+        if log['poi__name'] and log['poi__name'] != prev['poi__name']:
+            anchors.add(i)  # Arrived at a POI
+        if log['region'] != prev['region']:
+            anchors.update((i - 1, i))  # Last log in the old region, first in the new one
+    return anchors
+
+
+def _farthest_point(xy, start, stop):
+    """Index and distance of the point in xy[start + 1:stop] farthest from the segment xy[start]-xy[stop]."""
+    a, b = xy[start], xy[stop]
+    points = xy[start + 1:stop]
+    ab = b - a
+    length_sq = float(ab @ ab)
+    if length_sq:
+        t = np.clip((points - a) @ ab / length_sq, 0.0, 1.0)
+        offsets = points - (a + t[:, None] * ab)
+    else:
+        offsets = points - a
+    distances = np.hypot(offsets[:, 0], offsets[:, 1])
+    i = int(np.argmax(distances))
+    return start + 1 + i, float(distances[i])
+
+
+def simplify_map_logs(logs, point_budget=MAP_LOG_POINT_BUDGET, tolerance=MAP_LOG_TOLERANCE_PX,
+                      keep_latest=MAP_LOG_KEEP_LATEST):
+    """
+    Ramer-Douglas-Peucker on map_pixel_x/y with a point budget.
+    Anchors are always kept. Between them, the point farthest from the simplified path is added
+    next, until point_budget points are kept or nothing is more than tolerance pixels off the path.
+    Stationary stretches collapse to their end points.
+    """
+    if len(logs) <= 2:
+        return list(logs)
+
+    xy = np.array([(log['map_pixel_x'], log['map_pixel_y']) for log in logs], dtype=np.float64)
+    keep = get_map_log_anchors(logs, keep_latest)
+
+    heap = []
+
+    def push(start, stop):
+        if stop - start > 1:
+            i, distance = _farthest_point(xy, start, stop)
+            if distance > tolerance:
+                heapq.heappush(heap, (-distance, i, start, stop))
+
+    anchors = sorted(keep)
+    for start, stop in zip(anchors, anchors[1:]):
+        push(start, stop)
+
+    while heap and len(keep) < point_budget:
+        _, i, start, stop = heapq.heappop(heap)
+        keep.add(i)
+        push(start, i)
+        push(i, stop)
+
+    return [logs[i] for i in sorted(keep)]
@@ -0,0 +1,170 @@
+from apps.daggerwalk.models import ProvinceShape
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from django.core.cache import cache
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+import math
+import os
+
+# Draws the world map the way map.js shows it for the Bluesky screenshot (the "Today" logs, region labels,
+# latest log highlighted, zoomed in on the logs) without a browser.
+
+MAP_IMAGE_PATH = os.path.join(settings.STATIC_DIR_PATH, 'img', 'daggerwalk', 'world_map_stitched_climates.png')
+LATEST_LOG_ICON_PATH = os.path.join(settings.STATIC_DIR_PATH, 'img', 'daggerwalk', 'Daggerwalk.ico')
+LABEL_FONT_PATHS = ('DejaVuSans-Bold.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf')
+
+MAP_WIDTH, MAP_HEIGHT = 1000, 500  # Map pixel space, same as the image the logs' map_pixel_x/y refer to
+RECENT_LOG_WINDOW = timedelta(days=1)  # The map's default "Today" filter
+ACCENT_COLOR = (242, 229, 48)  # --accent-color
+BACKGROUND_COLOR = (0, 0, 0)  # --background-color
+LOG_DOT_SIZE = 8
+LATEST_LOG_SIZE = 20
+LOG_LINE_WIDTH = 2
+LOG_LINE_DASH = (4, 8)
+LABEL_FONT_SIZE = 12
+
+# Same as REGION_LABEL_OFFSETS in map.js, in map pixels (y up)
+REGION_LABEL_OFFSETS = {
+    "Shalgora": (20, 20), "Daenia": (10, 0), "Phrygias": (0, 15),
+    "Alcaire": (-25, 0), "Wrothgarian Mountains": (25, 50),
+    "Dragontail Mountains": (-60, -10), "Wayrest": (-20, 0),
+    "Gavaudon": (-30, 20), "Mournoth": (10, 20),
+    "Cybiades": (30, 5), "Myrkwasa": (20, 0),
+    "Pothago": (5, 10), "Kairou": (15, 15),
+    "Antiphyllos": (20, 10), "Alik'r Desert": (-100, -40),
+}
+
+_images = {}
+
+
+def _load_image(path, mode):
+    # The source images never change while the process runs
+    if path not in _images:
+        with Image.open(path) as image:
+            _images[path] = image.convert(mode)
+    return _images[path]
+
+
+def _load_font(size):
+    for path in LABEL_FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def get_recent_map_logs(logs, now=None):
+    """The cached map logs from the last day, or all of them if there are none (like the map's date filter)."""
+    since = (now or timezone.now()) - RECENT_LOG_WINDOW
+    recent = [log for log in logs if log['created_at'] >= since]
+    return sorted(recent or logs, key=lambda log: log['created_at'])
+
+
+def get_region_shapes():
+    """[(name, [(x, y), ...])] ProvinceShapes projected into map pixels as in map.js."""
+    shapes = list(ProvinceShape.objects.select_related('region'))
+    points = [point for shape in shapes for point in shape.coordinates]
+    if not points:
+        return []
+    min_x, min_y = min(x for x, _ in points), min(y for _, y in points)
+    span_x = (max(x for x, _ in points) - min_x) or 1
+    span_y = (max(y for _, y in points) - min_y) or 1
+
+    return [
+        (shape.region.name, [((x - min_x) * MAP_WIDTH / span_x + 15, (y - min_y) * MAP_HEIGHT / span_y)
+                             for x, y in shape.coordinates])
+        for shape in shapes
+    ]
+
+
+def get_label_position(name, polygon):
+    """Center of the polygon's bounds plus the region's label offset, like drawRegionShapes in map.js."""
+    xs, ys = [x for x, _ in polygon], [y for _, y in polygon]
+    offset_x, offset_y = REGION_LABEL_OFFSETS.get(name, (0, 0))
+    return (min(xs) + max(xs)) / 2 + offset_x, (min(ys) + max(ys)) / 2 - offset_y
+
+
+def _dashed_line(draw, points, dash, fill, width):
+    on, off = dash
+    period = on + off
+    travelled = 0.0
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        length = math.hypot(x1 - x0, y1 - y0)
+        position = 0.0
+        while position < length:
+            phase = (travelled + position) % period
+            step = min((on - phase) if phase < on else (period - phase), length - position)
+            if phase < on:
+                a, b = position / length, (position + step) / length
+                draw.line([(x0 + (x1 - x0) * a, y0 + (y1 - y0) * a), (x0 + (x1 - x0) * b, y0 + (y1 - y0) * b)],
+                          fill=fill, width=width)
+            position += step
+        travelled += length
+
+
+def render_map_image(path=None, logs=None, zoom=2, size=(1000, 1000), scale=2, now=None, labels=True, outlines=False):
+    """
+    Renders the map as a PNG, centered on the recent logs at Leaflet zoom level `zoom` in a `size` CSS pixel
+    viewport at `scale` device pixels per CSS pixel (the framing fit_map_to_log_bounds gives the screenshot).
+    logs defaults to the cached daggerwalk_map_logs. outlines draws the region shapes, which the page keeps invisible.
+    Saves to path if given, returns the image.
+    """
+    if logs is None:
+        logs = cache.get("daggerwalk_map_logs") or []
+    logs = get_recent_map_logs(logs, now)
+
+    width, height = size[0] * scale, size[1] * scale
+    pixels_per_map_pixel = (2 ** zoom) * scale
+    if logs:
+        xs = [log['map_pixel_x'] for log in logs]
+        ys = [log['map_pixel_y'] for log in logs]
+        center_x, center_y = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+    else:
+        center_x, center_y = MAP_WIDTH / 2, MAP_HEIGHT / 2
+
+    left = center_x - width / 2 / pixels_per_map_pixel
+    top = center_y - height / 2 / pixels_per_map_pixel
+
+    def to_screen(x, y):
+        return (x - left) * pixels_per_map_pixel, (y - top) * pixels_per_map_pixel
+
+    extent = (left, top, left + width / pixels_per_map_pixel, top + height / pixels_per_map_pixel)
+    image = _load_image(MAP_IMAGE_PATH, 'RGB').transform(
+        (width, height), Image.EXTENT, extent, Image.BILINEAR, fillcolor=BACKGROUND_COLOR
+    )
+    draw = ImageDraw.Draw(image)
+
+    if labels or outlines:
+        font = _load_font(LABEL_FONT_SIZE * scale)
+        for name, polygon in get_region_shapes():
+            if outlines:
+                draw.polygon([to_screen(x, y) for x, y in polygon], outline=(255, 255, 255))
+            if labels:
+                draw.text(to_screen(*get_label_position(name, polygon)), name, font=font, fill=(255, 255, 255),
+                          anchor='mm', stroke_width=scale, stroke_fill=(0, 0, 0))
+
+    points = [to_screen(log['map_pixel_x'], log['map_pixel_y']) for log in logs]
+    if len(points) > 1:
+        _dashed_line(draw, points, [d * scale for d in LOG_LINE_DASH], ACCENT_COLOR, LOG_LINE_WIDTH * scale)
+
+    radius = LOG_DOT_SIZE * scale / 2
+    for sx, sy in points[:-1]:
+        draw.ellipse((sx - radius, sy - radius, sx + radius, sy + radius), fill=ACCENT_COLOR)
+
+    if points:
+        sx, sy = points[-1]
+        icon_size = LATEST_LOG_SIZE * scale
+        icon = _load_image(LATEST_LOG_ICON_PATH, 'RGBA').resize((icon_size, icon_size), Image.BILINEAR)
+        mask = Image.new('L', (icon_size, icon_size), 0)
+        ImageDraw.Draw(mask).ellipse((0, 0, icon_size - 1, icon_size - 1), fill=255)
+        alpha = ImageChops.multiply(icon.getchannel('A'), mask)
+        corner = (round(sx - icon_size / 2), round(sy - icon_size / 2))
+        image.paste(icon.convert('RGB'), corner, alpha)
+        draw.ellipse((corner[0], corner[1], corner[0] + icon_size - 1, corner[1] + icon_size - 1),
+                     outline=ACCENT_COLOR, width=scale)
+
+    if path:
+        image.save(path, format='PNG', optimize=False)
+    return image
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daggerwalk', '0010_poi_discovered_alter_quest_quest_giver_img_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaggerwalkStatsBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='EST calendar day')),
+                ('pre_stream', models.BooleanField(default=False, help_text='Covers midnight-9am EST instead of the streaming hours')),
+                ('data', models.JSONField(default=dict)),
+                ('last_log_id', models.PositiveIntegerField(default=0, help_text='Most recent DaggerwalkLog applied to this bucket')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daggerwalk Stats Bucket',
+                'verbose_name_plural': 'Daggerwalk Stats Buckets',
+                'ordering': ['day', '-pre_stream'],
+                'unique_together': {('day', 'pre_stream')},
+            },
+        ),
+    ]
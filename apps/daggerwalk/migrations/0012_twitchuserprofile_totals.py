@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-18 07:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_profile_totals(apps, schema_editor):
+    TwitchUserProfile = apps.get_model('daggerwalk', 'TwitchUserProfile')
+    Completion = TwitchUserProfile.completed_quests.through
+
+    totals = (
+        Completion.objects
+        .filter(twitchuserprofile_id=OuterRef('pk'))
+        .order_by()
+        .values('twitchuserprofile_id')
+        .annotate(xp=Sum('quest__xp'), count=Count('quest_id'))
+    )
+    TwitchUserProfile.objects.update(
+        total_xp=Coalesce(Subquery(totals.values('xp')), 0),
+        completed_count=Coalesce(Subquery(totals.values('count')), 0),
+    )
+
+
+def noop_reverse(apps, schema_editor):
+    # The columns are dropped on reverse
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daggerwalk', '0011_daggerwalkstatsbucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='twitchuserprofile',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='twitchuserprofile',
+            name='total_xp',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_profile_totals, noop_reverse),
+        migrations.AddIndex(
+            model_name='twitchuserprofile',
+            index=models.Index(fields=['-total_xp', 'twitch_username'], name='daggerwalk_profile_leaderboard'),
+        ),
+    ]
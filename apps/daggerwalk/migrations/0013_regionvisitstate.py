@@ -0,0 +1,64 @@
+# Generated by Django 4.2 on 2026-10-18 07:42
+
+from django.db import migrations, models
+from django.db.models import Max
+import django.db.models.deletion
+
+
+def backfill_region_visit_states(apps, schema_editor):
+    DaggerwalkLog = apps.get_model('daggerwalk', 'DaggerwalkLog')
+    RegionVisitState = apps.get_model('daggerwalk', 'RegionVisitState')
+
+    latest_ids = (
+        DaggerwalkLog.objects
+        .exclude(region="Ocean")
+        .order_by()
+        .values('region')
+        .annotate(last_id=Max('id'))
+        .values_list('last_id', flat=True)
+    )
+    RegionVisitState.objects.bulk_create([
+        RegionVisitState(
+            region=log.region,
+            region_fk_id=log.region_fk_id,
+            last_log_id=log.id,
+            last_seen=log.created_at,
+            location=log.location,
+            weather=log.weather,
+            current_song=log.current_song,
+        )
+        for log in DaggerwalkLog.objects.filter(id__in=list(latest_ids))
+    ])
+
+
+def noop_reverse(apps, schema_editor):
+    # The table is dropped on reverse
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('daggerwalk', '0012_twitchuserprofile_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionVisitState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(help_text='Region name, as logged', max_length=255, unique=True)),
+                ('last_log_id', models.PositiveIntegerField(default=0, help_text='Most recent DaggerwalkLog in this region')),
+                ('last_seen', models.DateTimeField()),
+                ('location', models.CharField(max_length=255)),
+                ('weather', models.CharField(max_length=255)),
+                ('current_song', models.CharField(blank=True, max_length=255, null=True)),
+                ('region_fk', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='daggerwalk.region')),
+            ],
+            options={
+                'verbose_name': 'Daggerwalk Region Visit State',
+                'verbose_name_plural': 'Daggerwalk Region Visit States',
+            },
+        ),
+        migrations.RunPython(backfill_region_visit_states, noop_reverse),
+    ]
@@ -1,10 +1,16 @@
 from .quest_gen import build_ctx_from_quest, seed_for_quest, unique_description, generate_giver_name
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.core.cache import cache
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.db import models
+from functools import partial
+from uuid import uuid4
 import random
 
 
@@ -68,7 +74,8 @@ class POI(models.Model):
         if not self.emoji:
             self.emoji = self.get_emoji()
         
-        if not self.discovered:
+        # A POI that hasn't been saved yet can't have any logs
+        if not self.discovered and self.pk:
             from apps.daggerwalk.models import DaggerwalkLog  # avoid circular import
             earliest_log = (
                 DaggerwalkLog.objects
@@ -100,6 +107,51 @@ class POI(models.Model):
         ]
         return random.choice(emoji_choices)
 
+
+class LocationIndex:
+    """
+    Per-process lookup of Region by name and POI by (region_id, name) so log ingest doesn't have to
+    query these small, rarely changing tables. Saving or deleting a Region/POI bumps a version key in
+    the shared cache, and each process reloads its copy once it sees the version change.
+    """
+    VERSION_CACHE_KEY = 'daggerwalk_location_index_version'
+
+    def __init__(self):
+        self.version = None
+        self.regions = {}
+        self.pois = {}
+
+    def _shared_version(self):
+        version = cache.get(self.VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(self.VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+            version = cache.get(self.VERSION_CACHE_KEY)
+        return version
+
+    def _ensure_loaded(self):
+        version = self._shared_version()
+        if self.version is not None and version == self.version:
+            return
+        regions = {region.name: region for region in Region.objects.all()}
+        pois = {(poi.region_id, poi.name): poi for poi in POI.objects.select_related('region')}
+        self.regions, self.pois, self.version = regions, pois, version
+
+    def invalidate(self):
+        self.version = None
+        cache.set(self.VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+    def get_region(self, name):
+        self._ensure_loaded()
+        return self.regions.get(name)
+
+    def get_poi(self, region_id, name):
+        self._ensure_loaded()
+        return self.pois.get((region_id, name))
+
+
+location_index = LocationIndex()
+
+
 class DaggerwalkLog(models.Model):
     # World coordinates
     world_x = models.IntegerField(help_text="X coordinate in world space")
@@ -151,12 +203,13 @@ class DaggerwalkLog(models.Model):
     
     def save(self, *args, **kwargs):
         self.season = self.determine_season()
-        
+        self.resolve_location()
+        super().save(*args, **kwargs)
+
+    def resolve_location(self):
+        """Links the Region, last known land Region (when at sea) and POI for this log's location."""
         # Try to set the foreign key to Region
-        try:
-            self.region_fk = Region.objects.get(name=self.region)
-        except Region.DoesNotExist:
-            self.region_fk = None
+        self.region_fk = location_index.get_region(self.region)
 
         # Handle Ocean region - set last_known_region to most recent non-ocean region
         if self.region.lower() == "ocean" and not self.last_known_region:
@@ -175,21 +228,20 @@ class DaggerwalkLog(models.Model):
         is_wilderness = any(keyword.lower() in self.location.lower() for keyword in non_poi_keywords)
         
         if not is_wilderness and self.region_fk:
-            try:
-                # Try to find a POI with matching name and region
-                self.poi = POI.objects.get(name=self.location, region=self.region_fk)
-            except POI.DoesNotExist:
-                # If no POI exists, create one
-                self.poi = POI.objects.create(
+            # Try to find a POI with matching name and region
+            self.poi = location_index.get_poi(self.region_fk.id, self.location)
+            if self.poi is None:
+                # Not in the index yet - check the table in case another process just created it
+                self.poi, _ = POI.objects.get_or_create(
                     name=self.location,
                     region=self.region_fk,
-                    type='landmark',
-                    map_pixel_x=self.map_pixel_x,
-                    map_pixel_y=self.map_pixel_y,
-                    discovered=timezone.now()
+                    defaults={
+                        'type': 'landmark',
+                        'map_pixel_x': self.map_pixel_x,
+                        'map_pixel_y': self.map_pixel_y,
+                        'discovered': timezone.now(),
+                    }
                 )
-
-        super().save(*args, **kwargs)
     
     def determine_season(self):
         """
@@ -239,6 +291,13 @@ class DaggerwalkLog(models.Model):
         }
         return weather_emoji.get(weather, "")
 
+@receiver([post_save, post_delete], sender=Region)
+@receiver([post_save, post_delete], sender=POI)
+def invalidate_location_index(sender, instance, **kwargs):
+    # Wait for the commit so other processes can't reload the index without the change
+    transaction.on_commit(location_index.invalidate)
+
+
 class RegionMapPart(models.Model):
     """For multi-part region maps"""
     region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='map_parts')
@@ -305,6 +364,79 @@ class ChatCommandLog(models.Model):
         super().save(*args, **kwargs)
 
 
+class POIRotation:
+    """
+    The POIs that haven't had a quest yet, grouped by region, kept in the shared cache so picking the
+    next quest's POI is a single lookup instead of a scan of the whole quest history.
+    Built on first use, updated as quests are created, and thrown away (to be rebuilt) when POIs,
+    regions or existing quests change.
+    """
+    CACHE_KEY = 'daggerwalk_poi_rotation'
+    LOCK_KEY = 'daggerwalk_poi_rotation_lock'
+    LOCK_TIMEOUT = 30
+
+    def _build(self):
+        regions, region_of = {}, {}
+        for poi_id, region_id in POI.objects.order_by('id').values_list('id', 'region_id'):
+            regions.setdefault(region_id, []).append(poi_id)
+            region_of[poi_id] = region_id
+
+        quests_with_poi = Quest.objects.exclude(poi__isnull=True)
+        used = set(quests_with_poi.order_by().values_list('poi_id', flat=True).distinct())
+        last_region_id = quests_with_poi.order_by('-created_at').values_list('poi__region_id', flat=True).first()
+
+        unused = {}
+        for region_id, poi_ids in regions.items():
+            remaining = [poi_id for poi_id in poi_ids if poi_id not in used]
+            if remaining:
+                unused[region_id] = remaining
+        return {'all': regions, 'unused': unused, 'region_of': region_of, 'last_region_id': last_region_id}
+
+    def _get_state(self):
+        state = cache.get(self.CACHE_KEY)
+        if state is None:
+            state = self._build()
+            cache.set(self.CACHE_KEY, state, timeout=None)
+        return state
+
+    @staticmethod
+    def _pick_from(regions, exclude_region_id):
+        """Uniformly random POI id from {region_id: [poi ids]}, outside exclude_region_id if there are any."""
+        candidates = [region_id for region_id in regions if region_id != exclude_region_id] or list(regions)
+        i = random.randrange(sum(len(regions[region_id]) for region_id in candidates) or 1)
+        for region_id in candidates:
+            if i < len(regions[region_id]):
+                return regions[region_id][i]
+            i -= len(regions[region_id])
+        return None
+
+    def pick(self):
+        """
+        The POI id for a new quest: an unused POI while any are left, then any POI,
+        preferring a different region than the last quest's. None if there are no POIs.
+        """
+        state = self._get_state()
+        return self._pick_from(state['unused'] or state['all'], state['last_region_id'])
+
+    def mark_used(self, poi_id):
+        with cache.lock(self.LOCK_KEY, timeout=self.LOCK_TIMEOUT):
+            state = self._get_state()
+            region_id = state['region_of'].get(poi_id)
+            remaining = [i for i in state['unused'].get(region_id, []) if i != poi_id]
+            if remaining:
+                state['unused'][region_id] = remaining
+            else:
+                state['unused'].pop(region_id, None)
+            state['last_region_id'] = region_id
+            cache.set(self.CACHE_KEY, state, timeout=None)
+
+    def invalidate(self):
+        cache.delete(self.CACHE_KEY)
+
+
+poi_rotation = POIRotation()
+
+
 def rand_quest_giver_img_number():
     return random.randint(1, 502)    
 
@@ -356,55 +488,13 @@ class Quest(models.Model):
             # multiples of 5 between 0 and 50 inclusive
             self.xp = random.randrange(5, 55, 5)
 
-    def _pick_random_from_qs(self, qs):
-        """
-        Faster than order_by('?') for medium/large tables:
-        sample a random offset based on count, then pick one row.
-        """
-        count = qs.count()
-        if count == 0:
-            return None
-        return qs.all()[random.randrange(count)]
-
     def _choose_poi_if_needed(self, is_create: bool):
         if not (is_create and self.poi is None):
             return
 
-        with transaction.atomic():
-            # Last quest's region (if any)
-            last_q = (
-                Quest.objects.exclude(poi__isnull=True)
-                .select_related('poi__region')
-                .order_by('-created_at')
-                .only('poi__region')  # light fetch
-                .first()
-            )
-            last_region_id = last_q.poi.region_id if last_q and last_q.poi_id else None
-
-            # Unused first
-            used_ids = (
-                Quest.objects.exclude(poi__isnull=True)
-                .values_list('poi_id', flat=True)
-                .distinct()
-            )
-            unused_qs = POI.objects.exclude(id__in=list(used_ids))
-
-            selected = None
-
-            def pick_with_region_preference(qs, exclude_region_id):
-                if exclude_region_id:
-                    preferred = qs.exclude(region_id=exclude_region_id)
-                    return self._pick_random_from_qs(preferred) or self._pick_random_from_qs(qs)
-                return self._pick_random_from_qs(qs)
-
-            if unused_qs.exists():
-                selected = pick_with_region_preference(unused_qs, last_region_id)
-            else:
-                all_qs = POI.objects.all()
-                selected = pick_with_region_preference(all_qs, last_region_id)
-
-            if selected:
-                self.poi = selected
+        poi_id = poi_rotation.pick()
+        if poi_id:
+            self.poi = POI.objects.select_related('region').filter(pk=poi_id).first()
 
     def _maybe_init_giver_name(self, is_create: bool):
         if is_create and not self.quest_giver_name:
@@ -444,14 +534,207 @@ class TwitchUserProfile(models.Model):
     completed_quests = models.ManyToManyField(Quest, related_name='completed_by', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Denormalized from completed_quests for the leaderboard, kept up to date by refresh_profile_totals
+    total_xp = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_xp', 'twitch_username'], name='daggerwalk_profile_leaderboard'),
+        ]
+
     def __str__(self):
         return self.twitch_username
 
     @property
     def chat_commands(self):
         return ChatCommandLog.objects.filter(user__iexact=self.twitch_username)
-    
-    @property
-    def total_xp(self):
-        result = self.completed_quests.aggregate(total=Sum('xp'))
-        return result['total'] or 0
+
+
+def refresh_profile_totals(profiles):
+    """Recomputes total_xp and completed_count from completed_quests for a TwitchUserProfile queryset, in one UPDATE."""
+    totals = (
+        TwitchUserProfile.completed_quests.through.objects
+        .filter(twitchuserprofile_id=OuterRef('pk'))
+        .order_by()
+        .values('twitchuserprofile_id')
+        .annotate(xp=Sum('quest__xp'), count=Count('quest_id'))
+    )
+    profiles.update(
+        total_xp=Coalesce(Subquery(totals.values('xp')), 0),
+        completed_count=Coalesce(Subquery(totals.values('count')), 0),
+    )
+
+
+class DaggerwalkStatsBucket(models.Model):
+    """
+    Running stats aggregates for one slice of an EST calendar day, merged together to build the stats ranges.
+    Each day has a streaming bucket (9am-midnight) and a pre_stream bucket (midnight-9am) so that
+    range boundaries always fall on bucket boundaries.
+    """
+    day = models.DateField(help_text="EST calendar day")
+    pre_stream = models.BooleanField(default=False, help_text="Covers midnight-9am EST instead of the streaming hours")
+    data = models.JSONField(default=dict)
+    last_log_id = models.PositiveIntegerField(default=0, help_text="Most recent DaggerwalkLog applied to this bucket")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Daggerwalk Stats Bucket'
+        verbose_name_plural = 'Daggerwalk Stats Buckets'
+        unique_together = ('day', 'pre_stream')
+        ordering = ['day', '-pre_stream']
+
+    def __str__(self):
+        return f"{self.day} ({'pre-stream' if self.pre_stream else 'streaming'})"
+
+
+class RegionVisitState(models.Model):
+    """
+    The most recent DaggerwalkLog seen in each region, kept up to date as logs come in
+    so the region panel doesn't have to aggregate the whole log table.
+    """
+    region = models.CharField(max_length=255, unique=True, help_text="Region name, as logged")
+    region_fk = models.ForeignKey(Region, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_log_id = models.PositiveIntegerField(default=0, help_text="Most recent DaggerwalkLog in this region")
+    last_seen = models.DateTimeField()
+    location = models.CharField(max_length=255)
+    weather = models.CharField(max_length=255)
+    current_song = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Daggerwalk Region Visit State'
+        verbose_name_plural = 'Daggerwalk Region Visit States'
+
+    def __str__(self):
+        return f"{self.region} (log {self.last_log_id})"
+
+    @classmethod
+    def record(cls, log):
+        """Moves the log's region to this log if it's newer than the one recorded. One query when the region has been seen before."""
+        if log.region == "Ocean":
+            return
+        fields = {
+            'region_fk_id': log.region_fk_id,
+            'last_log_id': log.id,
+            'last_seen': log.created_at,
+            'location': log.location,
+            'weather': log.weather,
+            'current_song': log.current_song,
+        }
+        if not cls.objects.filter(region=log.region, last_log_id__lt=log.id).update(**fields):
+            # First visit, or a newer log got there first (ignored)
+            cls.objects.bulk_create([cls(region=log.region, **fields)], ignore_conflicts=True)
+
+    @classmethod
+    def refresh(cls, region):
+        """Recomputes one region from the log table, e.g. after its latest log was deleted."""
+        log = DaggerwalkLog.objects.filter(region=region).order_by('-id').first()
+        if log is None:
+            cls.objects.filter(region=region).delete()
+        else:
+            cls.objects.filter(region=region).update(last_log_id=0)
+            cls.record(log)
+
+
+DATA_VERSION_CACHE_KEY = 'daggerwalk_data_version'
+ACTIVE_QUEST_CACHE_KEY = 'daggerwalk_active_quest'
+
+
+def mark_daggerwalk_data_changed(*model_names):
+    """Bumps the data version of each model so the cache segments built from it get rebuilt."""
+    for model_name in model_names:
+        key = f"{DATA_VERSION_CACHE_KEY}:{model_name}"
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_daggerwalk_data_versions(model_names):
+    keys = {f"{DATA_VERSION_CACHE_KEY}:{model_name}": model_name for model_name in model_names}
+    values = cache.get_many(list(keys))
+    return {model_name: values.get(key, 0) for key, model_name in keys.items()}
+
+
+@receiver([post_save, post_delete], sender=DaggerwalkLog)
+@receiver([post_save, post_delete], sender=Region)
+@receiver([post_save, post_delete], sender=POI)
+@receiver([post_save, post_delete], sender=ProvinceShape)
+@receiver([post_save, post_delete], sender=ChatCommandLog)
+@receiver([post_save, post_delete], sender=Quest)
+@receiver([post_save, post_delete], sender=TwitchUserProfile)
+def track_daggerwalk_data_change(sender, instance, **kwargs):
+    # bulk_create doesn't send signals, callers using it mark the model themselves
+    transaction.on_commit(partial(mark_daggerwalk_data_changed, sender.__name__))
+
+
+@receiver(m2m_changed, sender=TwitchUserProfile.completed_quests.through)
+def track_completed_quests_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Profiles whose totals change: the profile itself, or the profiles added to/removed from a quest
+    if action == 'pre_clear' and reverse:
+        instance._cleared_profile_ids = list(instance.completed_by.values_list('id', flat=True))
+    if not action.startswith('post_'):
+        return
+
+    if not reverse:
+        profile_ids = [instance.pk]
+    elif action == 'post_clear':
+        profile_ids = getattr(instance, '_cleared_profile_ids', [])
+    else:
+        profile_ids = list(pk_set or [])
+    refresh_profile_totals(TwitchUserProfile.objects.filter(id__in=profile_ids))
+    transaction.on_commit(partial(mark_daggerwalk_data_changed, 'TwitchUserProfile'))
+
+
+@receiver(post_save, sender=Quest)
+def refresh_quest_completer_totals(sender, instance, created, **kwargs):
+    # The quest's xp may have changed
+    if not created:
+        refresh_profile_totals(TwitchUserProfile.objects.filter(completed_quests=instance))
+
+
+@receiver(pre_delete, sender=Quest)
+def refresh_totals_for_deleted_quest(sender, instance, **kwargs):
+    profile_ids = list(instance.completed_by.values_list('id', flat=True))
+    if profile_ids:
+        # The M2M rows are gone once the delete commits
+        transaction.on_commit(partial(refresh_profile_totals, TwitchUserProfile.objects.filter(id__in=profile_ids)))
+
+
+@receiver([post_save, post_delete], sender=Quest)
+@receiver([post_save, post_delete], sender=POI)
+@receiver([post_save, post_delete], sender=Region)
+def invalidate_active_quest(sender, instance, **kwargs):
+    # The cached active quest (see ingest.get_active_quest) includes its serialized POI and region
+    transaction.on_commit(partial(cache.delete, ACTIVE_QUEST_CACHE_KEY))
+
+
+@receiver(post_save, sender=Quest)
+def update_poi_rotation(sender, instance, created, **kwargs):
+    if created and instance.poi_id:
+        transaction.on_commit(partial(poi_rotation.mark_used, instance.poi_id))
+    elif not created:
+        # An edit could have changed the quest's POI
+        transaction.on_commit(poi_rotation.invalidate)
+
+
+@receiver(post_delete, sender=Quest)
+@receiver([post_save, post_delete], sender=POI)
+@receiver(post_delete, sender=Region)
+def invalidate_poi_rotation(sender, instance, **kwargs):
+    transaction.on_commit(poi_rotation.invalidate)
+
+
+@receiver(post_save, sender=DaggerwalkLog)
+def update_region_visit_state(sender, instance, created, **kwargs):
+    if created:
+        RegionVisitState.record(instance)
+    else:
+        # An edit can change what a region's latest log says, or move the log to another region
+        regions = set(RegionVisitState.objects.filter(last_log_id=instance.id).values_list('region', flat=True))
+        for region in regions | {instance.region}:
+            RegionVisitState.refresh(region)
+
+
+@receiver(post_delete, sender=DaggerwalkLog)
+def refresh_region_visit_state(sender, instance, **kwargs):
+    if RegionVisitState.objects.filter(region=instance.region, last_log_id=instance.id).exists():
+        RegionVisitState.refresh(instance.region)
@@ -1,7 +1,10 @@
+from django.db.models import Case, IntegerField, Max, Value, When
+from django.db.models.functions import Lower
+from django.core.cache import cache
 from django.utils import timezone
 from django.db import transaction
 from dataclasses import dataclass
-from django.db.models import Max
+from functools import partial
 from typing import Iterable
 import hashlib, random, re
 
@@ -169,9 +172,20 @@ def complete_and_rotate_quest(active_quest, completed_at, completion_request_log
       max(completed_at, latest ChatCommandLog.timestamp attached to the completing request_log)
     if completion_request_log_id is provided; otherwise window_end = completed_at.
 
-    Returns (completed_meta, next_active_quest).
+    The quest is claimed with a conditional UPDATE, so if two logs race to complete it only one rotates.
+    Participants are credited, and their leaderboard totals updated, in a fixed number of queries however many there are.
+
+    Returns (completed_meta, next_active_quest), or (None, None) if the quest was no longer in progress.
     """
-    from apps.daggerwalk.models import ChatCommandLog, Quest, TwitchUserProfile
+    from apps.daggerwalk.models import (
+        ACTIVE_QUEST_CACHE_KEY,
+        ChatCommandLog,
+        Quest,
+        TwitchUserProfile,
+        mark_daggerwalk_data_changed,
+        refresh_profile_totals,
+    )
+    from apps.daggerwalk.ingest import get_or_create_profile_ids
 
     # Resolve window_end
     base_completed_at = completed_at or timezone.now()
@@ -187,53 +201,57 @@ def complete_and_rotate_quest(active_quest, completed_at, completion_request_log
         window_end = base_completed_at
 
     with transaction.atomic():
-        # Mark quest completed using the window_end
+        # Mark quest completed using the window_end, unless someone else already has
+        claimed = (
+            Quest.objects
+            .filter(pk=active_quest.pk, status="in_progress")
+            .update(status="completed", completed_at=window_end)
+        )
+        if not claimed:
+            return None, None
         active_quest.status = "completed"
         active_quest.completed_at = window_end
-        active_quest.save(update_fields=["status", "completed_at"])
+        # update() skips the save signals
+        transaction.on_commit(partial(mark_daggerwalk_data_changed, 'Quest'))
+        transaction.on_commit(partial(cache.delete, ACTIVE_QUEST_CACHE_KEY))
 
         # Unique participants during quest window (inclusive)
         participants = list(
             ChatCommandLog.objects
             .filter(timestamp__gte=active_quest.created_at, timestamp__lte=window_end)
+            .order_by()  # The default ordering would add timestamp to the DISTINCT
             .values_list("user", flat=True)
             .distinct()
         )
 
         # Ensure profiles (case-insensitive) + credit completion (M2M)
         if participants:
-            profile_ids = []
-            for uname in participants:
-                # Case-insensitive lookup first
-                try:
-                    prof = TwitchUserProfile.objects.get(twitch_username__iexact=uname)
-                except TwitchUserProfile.DoesNotExist:
-                    # Create with the exact casing from this command
-                    prof = TwitchUserProfile.objects.create(twitch_username=uname)
-                profile_ids.append(prof.id)
-                
-                # Link any orphaned chat logs for this user
-                ChatCommandLog.objects.filter(
-                    user__iexact=uname,
-                    profile__isnull=True
-                ).update(profile=prof)
+            profile_ids = get_or_create_profile_ids(participants)
+
+            # Link any orphaned chat logs for these users, in one UPDATE
+            (
+                ChatCommandLog.objects
+                .annotate(user_lower=Lower("user"))
+                .filter(profile__isnull=True, user_lower__in=list(profile_ids))
+                .update(profile_id=Case(
+                    *[When(user_lower=uname_lower, then=Value(pid)) for uname_lower, pid in profile_ids.items()],
+                    output_field=IntegerField(),
+                ))
+            )
 
             through = TwitchUserProfile.completed_quests.through
-            rows = [through(twitchuserprofile_id=pid, quest_id=active_quest.id) for pid in profile_ids]
+            credited_ids = set(profile_ids.values())
+            rows = [through(twitchuserprofile_id=pid, quest_id=active_quest.id) for pid in credited_ids]
             if rows:
                 through.objects.bulk_create(rows, ignore_conflicts=True)
+                # Leaderboard totals, in the same transaction as the credit
+                refresh_profile_totals(TwitchUserProfile.objects.filter(id__in=credited_ids))
+                transaction.on_commit(partial(mark_daggerwalk_data_changed, 'TwitchUserProfile'))
 
         # New in-progress quest
         next_quest = Quest.objects.create(status="in_progress")
-        next_quest = (
-            Quest.objects.select_related("poi", "poi__region")
-            .only(
-                "id", "status", "xp", "description",
-                "quest_giver_name", "quest_giver_img_number",
-                "poi__name", "poi__region__name"
-            )
-            .get(pk=next_quest.pk)
-        )
+        # Full rows, the caller serializes it (deferred fields would cost a query each)
+        next_quest = Quest.objects.select_related("poi", "poi__region").get(pk=next_quest.pk)
 
         completed_meta = {
             "id": active_quest.id,
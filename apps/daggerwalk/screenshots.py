@@ -0,0 +1,203 @@
+from apps.daggerwalk.cache_segments import get_daggerwalk_home_html
+from playwright.sync_api import sync_playwright
+from django.conf import settings
+from urllib.parse import urlsplit
+import logging
+import atexit
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+
+SCREENSHOT_VIEWPORT = {"width": 1000, "height": 1000}
+SCREENSHOT_TIMEOUT_MS = 45000
+MAP_READY_JS = "!!window.daggerwalkMapReady && Object.values(window.daggerwalkMapReady).every(Boolean)"
+NEXT_PAINT_JS = "new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)))"
+HIDE_UI_JS = """
+    document.querySelectorAll(
+        '.leaflet-control, .stats-panel, .current-status, .header, .footer, .ui-toolbar, #filters'
+    ).forEach(el => el.style.display = 'none');
+"""
+FIT_TO_LOGS_JS = """
+    targetZoom => {
+        const map = window.daggerwalkMap;
+        if (!map || !window.L) return;
+
+        const bounds = L.latLngBounds();
+        map.eachLayer(layer => {
+            if (!layer.getLatLng) return;
+            const el = layer.getElement ? layer.getElement() : layer._icon;
+            if (!el) return;
+            const className = el.className || '';
+            if (className.includes('log-marker') || className.includes('latest-log')) {
+                bounds.extend(layer.getLatLng());
+            }
+        });
+        if (!bounds.isValid()) return;
+
+        map.setView(bounds.getCenter(), targetZoom, { animate: false });
+        if (map.altImageLayer) {
+            map.removeLayer(map.altImageLayer);
+            map.altImageLayer = null;
+        }
+        const base = map.baseImageLayer?.getElement?.();
+        if (base) base.style.display = '';
+        map.invalidateSize();
+        return map.getZoom();
+    }
+"""
+
+
+def get_daggerwalk_screenshot_paths(output_dir=None):
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        return {
+            'world': os.path.join(output_dir, 'world_map.png'),
+            'quest': os.path.join(output_dir, 'quest.png'),
+        }
+
+    return {
+        'world': 'world_map.png',
+        'quest': 'quest.png',
+    }
+
+
+class DaggerwalkScreenshotter:
+    """
+    Takes the Bluesky map and quest screenshots with one Chromium kept open for the life of the worker,
+    so each run skips the browser launch and reuses its HTTP cache for the CDN assets.
+    The page keeps its public URL but is served from the cached home HTML, and its other requests to
+    the site go to the local app server (DAGGERWALK_SCREENSHOT_LOCAL_URL) instead of out over the internet.
+    Steps wait on the readiness flags map.js sets rather than fixed sleeps.
+    """
+
+    def __init__(self):
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.last_timings = {}
+
+    def get_context(self):
+        if self.browser is None or not self.browser.is_connected():
+            self.close()
+            self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch(
+                headless=True,
+                executable_path=settings.PLAYWRIGHT_CHROMIUM_PATH
+            )
+            self.context = self.browser.new_context(viewport=SCREENSHOT_VIEWPORT, device_scale_factor=2)
+            self.context.set_default_timeout(SCREENSHOT_TIMEOUT_MS)
+        return self.context
+
+    def close(self):
+        try:
+            if self.browser is not None:
+                self.browser.close()
+            if self.playwright is not None:
+                self.playwright.stop()
+        except Exception as e:
+            logger.warning(f"Error closing screenshot browser: {e}")
+        finally:
+            self.playwright = self.browser = self.context = None
+
+    def route_site_request(self, route):
+        request = route.request
+        url = urlsplit(request.url)
+        if request.resource_type == "document" and url.path.rstrip("/") == "/daggerwalk":
+            html = get_daggerwalk_home_html()
+            if html is not None:
+                return route.fulfill(status=200, content_type="text/html; charset=utf-8", body=html)
+        if url.path == "/daggerwalk/logs/stream/":
+            # A screenshot doesn't need live updates
+            return route.abort()
+
+        local_url = getattr(settings, "DAGGERWALK_SCREENSHOT_LOCAL_URL", None)
+        if not local_url:
+            return route.continue_()
+        local = f"{local_url.rstrip('/')}{url.path}" + (f"?{url.query}" if url.query else "")
+        # Headers nginx would add, so the app treats it like the public request (and doesn't redirect to https)
+        headers = {**request.headers, "host": url.netloc, "x-forwarded-proto": url.scheme}
+        route.fulfill(response=route.fetch(url=local, headers=headers))
+
+    def capture(self, base_url, output_dir=None, include_map=True):
+        """
+        Captures the quest panel and world map screenshots, returning {'quest': path, 'world': path}.
+        With include_map=False only the quest panel is captured (the map is drawn by map_render instead).
+        """
+        screenshots = get_daggerwalk_screenshot_paths(output_dir)
+        timings = {}
+        start = step_start = time.perf_counter()
+
+        def step(name):
+            nonlocal step_start
+            now = time.perf_counter()
+            timings[name] = now - step_start
+            step_start = now
+
+        try:
+            context = self.get_context()
+            step("browser")
+            page = context.new_page()
+        except Exception:
+            # Start from a fresh browser next time
+            self.close()
+            raise
+
+        try:
+            page.route(f"{base_url}/**", self.route_site_request)
+            logger.info("Opening Daggerwalk map page...")
+            page.goto(f"{base_url}/daggerwalk/", wait_until="domcontentloaded")
+            page.wait_for_function(MAP_READY_JS)
+            step("load")
+
+            quest_element = page.locator(".quests-wrapper").first
+            quest_element.wait_for(state="visible")
+            quest_element.screenshot(path=screenshots['quest'])
+            step("quest_screenshot")
+
+            if include_map:
+                self.prepare_map(page)
+                step("prepare_map")
+
+                zoom = page.evaluate(FIT_TO_LOGS_JS, 2)
+                page.evaluate(NEXT_PAINT_JS)
+                logger.info(f"Final map zoom: {zoom}")
+                step("fit_map")
+
+                page.locator("#map").screenshot(path=screenshots['world'])
+                step("map_screenshot")
+        finally:
+            page.close()
+
+        timings["total"] = time.perf_counter() - start
+        self.last_timings = timings
+        logger.info("Daggerwalk screenshots captured: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+        return screenshots
+
+    def prepare_map(self, page):
+        """Fullscreens the map with region labels and the latest log's popup showing, and hides the page UI."""
+        try:
+            page.click(".leaflet-control-fullscreen-button", timeout=5000)
+            page.wait_for_function("window.daggerwalkMap.isFullscreen && window.daggerwalkMap.isFullscreen()", timeout=5000)
+        except Exception:
+            logger.warning("Fullscreen button not found or failed to click.")
+
+        try:
+            page.click("#toggle-shapes", timeout=5000)
+            page.locator(".region-label").first.wait_for(state="attached", timeout=5000)
+        except Exception:
+            logger.warning("Labels button not found or failed to click.")
+
+        try:
+            page.click(".latest-log", timeout=5000)
+            page.locator(".leaflet-popup").first.wait_for(state="visible", timeout=5000)
+        except Exception:
+            logger.warning(".latest-log marker not found or failed to click.")
+
+        page.evaluate(HIDE_UI_JS)
+        page.evaluate(NEXT_PAINT_JS)
+
+
+screenshotter = DaggerwalkScreenshotter()
+atexit.register(screenshotter.close)
@@ -56,13 +56,8 @@ class QuestSerializer(serializers.ModelSerializer):
 
 
 class TwitchUserProfileSerializer(serializers.ModelSerializer):
-    total_xp = serializers.IntegerField(read_only=True)  # reads the model property 'total_xp'
-    completed_quests_count = serializers.SerializerMethodField()
+    completed_quests_count = serializers.IntegerField(source='completed_count', read_only=True)
 
     class Meta:
         model = TwitchUserProfile
         fields = ('twitch_username', 'created_at', 'total_xp', 'completed_quests_count')
-
-    def get_completed_quests_count(self, obj):
-        # uses annotated value if present; falls back to a count()
-        return getattr(obj, 'completed_quests_count', obj.completed_quests.count())
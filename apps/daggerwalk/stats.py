@@ -0,0 +1,418 @@
+from apps.daggerwalk.models import ChatCommandLog, DaggerwalkLog, DaggerwalkStatsBucket, Quest, TwitchUserProfile
+from apps.daggerwalk.columnar_stats import ColumnarStatsHistory
+from apps.daggerwalk.json_blobs import render_json, set_json_blob
+from apps.daggerwalk.utils import (
+    EST_TIMEZONE,
+    extract_date_key,
+    get_stats_date_ranges,
+    summarize_daggerwalk_stats,
+)
+from datetime import datetime, time
+from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.utils import timezone
+from django.db import transaction
+from django.db.models import Max
+import logging
+import math
+import pytz
+
+logger = logging.getLogger(__name__)
+
+
+STATS_RANGES = ['all', 'today', 'yesterday', 'last_7_days', 'this_month']
+STATS_TEMPLATE = 'daggerwalk/stats.html'
+STREAM_START_HOUR = 9
+RECENT_CHATS_LIMIT = 100
+HISTORY_CHUNK_SIZE = 5000
+
+LOG_FIELDS = (
+    'id', 'created_at', 'player_x', 'player_z', 'date', 'season',
+    'region', 'weather', 'current_song', 'poi__name', 'poi__emoji',
+    'region_fk__name'
+)
+CHAT_FIELDS = (
+    'id', 'request_log__created_at', 'timestamp', 'user',
+    'command', 'args', 'raw'
+)
+QUEST_FIELDS = ('id', 'created_at', 'completed_at', 'xp')
+
+
+def _iso(dt):
+    # Fixed-width UTC strings so stored timestamps compare correctly as text
+    return dt.astimezone(pytz.UTC).isoformat(timespec='microseconds')
+
+
+def _distance_km(a, b):
+    dx = b['x'] - a['x']
+    dz = b['z'] - a['z']
+    return math.sqrt(dx * dx + dz * dz) / 1000.0
+
+
+def get_bucket_key(dt):
+    """Returns the (EST day, pre_stream) bucket a timestamp belongs to."""
+    local = dt.astimezone(EST_TIMEZONE)
+    return local.date(), local.hour < STREAM_START_HOUR
+
+
+def get_bucket_start(day, pre_stream):
+    hour = 0 if pre_stream else STREAM_START_HOUR
+    return EST_TIMEZONE.localize(datetime.combine(day, time(hour)))
+
+
+def new_bucket_data():
+    return {
+        'logs': 0,
+        'first': None,
+        'last': None,
+        'distance_km': 0.0,
+        'regions': {},      # region -> [count, last_seen]
+        'pois': [],         # [poi_name, region_name, emoji, count]
+        'songs': {},
+        'weather': {},
+        'days': [],
+        'commands': {},     # command -> [count, latest timestamp]
+        'users': {},        # user -> [count, latest timestamp]
+        'recent_chats': [],
+        'quests': {'ids': [], 'duration_total': 0, 'duration_count': 0, 'xp': 0, 'walkers': []},
+    }
+
+
+def add_log(data, log):
+    """Applies a single log row (logs must be applied in created_at order)."""
+    created_at = _iso(log['created_at'])
+    entry = {
+        'created_at': created_at,
+        'x': float(log['player_x']),
+        'z': float(log['player_z']),
+        'date': log['date'],
+        'season': log['season'],
+    }
+
+    if data['last']:
+        data['distance_km'] += _distance_km(data['last'], entry)
+    else:
+        data['first'] = entry
+    data['last'] = entry
+    data['logs'] += 1
+
+    region = data['regions'].setdefault(log['region'], [0, created_at])
+    region[0] += 1
+    region[1] = created_at
+
+    if log.get('poi__name'):
+        key = [log['poi__name'], log.get('region_fk__name'), log.get('poi__emoji')]
+        for poi in data['pois']:
+            if poi[:3] == key:
+                poi[3] += 1
+                break
+        else:
+            data['pois'].append(key + [1])
+
+    if log.get('current_song'):
+        data['songs'][log['current_song']] = data['songs'].get(log['current_song'], 0) + 1
+
+    data['weather'][log['weather']] = data['weather'].get(log['weather'], 0) + 1
+
+    if log.get('date'):
+        day_key = extract_date_key(log['date'])
+        if day_key not in data['days']:
+            data['days'].append(day_key)
+
+
+def add_chat(data, chat):
+    timestamp = _iso(chat['timestamp'])
+    for counter, key in ((data['commands'], chat['command']), (data['users'], chat['user'])):
+        entry = counter.setdefault(key, [0, timestamp])
+        entry[0] += 1
+        entry[1] = max(entry[1], timestamp)
+
+    data['recent_chats'].append({
+        'timestamp': timestamp,
+        'user': chat['user'],
+        'command': chat['command'],
+        'args': chat['args'],
+        'raw': chat['raw'],
+    })
+    if len(data['recent_chats']) > RECENT_CHATS_LIMIT * 2:
+        _trim_recent_chats(data)
+
+
+def _trim_recent_chats(data):
+    data['recent_chats'].sort(key=lambda c: c['timestamp'], reverse=True)
+    del data['recent_chats'][RECENT_CHATS_LIMIT:]
+
+
+def add_quest(data, quest, walker_ids):
+    quests = data['quests']
+    if quest['id'] in quests['ids']:
+        return
+
+    quests['ids'].append(quest['id'])
+    if quest.get('created_at') and quest.get('completed_at'):
+        quests['duration_total'] += int((quest['completed_at'] - quest['created_at']).total_seconds() / 60)
+        quests['duration_count'] += 1
+    quests['xp'] += quest.get('xp', 0)
+    quests['walkers'] = sorted(set(quests['walkers']) | set(walker_ids))
+
+
+def merge_buckets(bucket_datas):
+    """
+    Folds chronologically ordered bucket data into the aggregates expected by summarize_daggerwalk_stats.
+    Distance between the last log of one bucket and the first log of the next is added here.
+    """
+    total_logs = 0
+    total_distance_km = 0.0
+    first = last = None
+    region_data, poi_data, song_counts, weather_counts = {}, {}, {}, {}
+    unique_days = set()
+    commands, users = {}, {}
+    recent_chats = []
+    quest_ids, walkers = set(), set()
+    duration_total = duration_count = total_xp = 0
+
+    for data in bucket_datas:
+        if data['logs']:
+            if last:
+                total_distance_km += _distance_km(last, data['first'])
+            first = first or data['first']
+            last = data['last']
+            total_logs += data['logs']
+            total_distance_km += data['distance_km']
+
+            for region, (count, last_seen) in data['regions'].items():
+                entry = region_data.setdefault(region, {'count': 0, 'last_seen': last_seen})
+                entry['count'] += count
+                entry['last_seen'] = max(entry['last_seen'], last_seen)
+
+            for poi_name, region_name, emoji, count in data['pois']:
+                key = (poi_name, region_name, emoji)
+                poi_data[key] = poi_data.get(key, 0) + count
+
+            for song, count in data['songs'].items():
+                song_counts[song] = song_counts.get(song, 0) + count
+            for weather, count in data['weather'].items():
+                weather_counts[weather] = weather_counts.get(weather, 0) + count
+            unique_days.update(data['days'])
+
+        for merged, counter in ((commands, data['commands']), (users, data['users'])):
+            for key, (count, latest) in counter.items():
+                entry = merged.setdefault(key, [0, latest])
+                entry[0] += count
+                entry[1] = max(entry[1], latest)
+        recent_chats.extend(data['recent_chats'])
+
+        quests = data['quests']
+        for quest_id in quests['ids']:
+            quest_ids.add(quest_id)
+        duration_total += quests['duration_total']
+        duration_count += quests['duration_count']
+        total_xp += quests['xp']
+        walkers.update(quests['walkers'])
+
+    for entry in region_data.values():
+        entry['last_seen'] = datetime.fromisoformat(entry['last_seen'])
+
+    def as_entry(log):
+        return {**log, 'created_at': datetime.fromisoformat(log['created_at'])} if log else None
+
+    def most_recent_first(counter):
+        # Matches the full scan, which counts chats newest first
+        ordered = sorted(counter.items(), key=lambda item: item[1][1], reverse=True)
+        return {key: count for key, (count, _) in ordered}
+
+    recent_chats.sort(key=lambda c: c['timestamp'], reverse=True)
+
+    return {
+        'total_logs': total_logs,
+        'total_distance_km': total_distance_km,
+        'first_entry': as_entry(first),
+        'last_entry': as_entry(last),
+        'region_data': region_data,
+        'poi_data': poi_data,
+        'song_counts': song_counts,
+        'weather_counts': weather_counts,
+        'unique_days': unique_days,
+        'cmd_counts': most_recent_first(commands),
+        'user_counts': most_recent_first(users),
+        'last_100': recent_chats[:RECENT_CHATS_LIMIT],
+        'quest_count': len(quest_ids),
+        'quest_durations': (duration_total, duration_count),
+        'total_xp': total_xp,
+        'walkers_with_xp': len(walkers),
+    }
+
+
+def stats_from_buckets(range_keyword, buckets):
+    """Same output as calculate_daggerwalk_stats, composed from chronologically ordered buckets."""
+    ranges = get_stats_date_ranges()
+    if range_keyword == 'all':
+        selected = buckets
+    elif range_keyword in ranges:
+        start_datetime, end_datetime = ranges[range_keyword]
+        selected = [
+            bucket for bucket in buckets
+            if start_datetime <= get_bucket_start(bucket.day, bucket.pre_stream) <= end_datetime
+        ]
+    else:
+        raise ValueError(f'Invalid range: {range_keyword}. Must be one of: {", ".join(list(ranges) + ["all"])}')
+
+    aggregates = merge_buckets(bucket.data for bucket in selected)
+
+    if range_keyword == 'all':
+        if not aggregates['total_logs']:
+            raise ValueError('No logs available.')
+        start_date = aggregates['first_entry']['created_at'].date()
+        end_date = aggregates['last_entry']['created_at'].date()
+    else:
+        start_date, end_date = start_datetime.date(), end_datetime.date()
+
+    return summarize_daggerwalk_stats(start_date, end_date, **aggregates)
+
+
+def get_quest_walkers(quests_qs):
+    """Maps quest id -> participant profile ids for the given quests, in one query."""
+    through = TwitchUserProfile.completed_quests.through
+    walkers = {}
+    rows = through.objects.filter(quest__in=quests_qs).values_list('quest_id', 'twitchuserprofile_id')
+    for quest_id, profile_id in rows:
+        walkers.setdefault(quest_id, []).append(profile_id)
+    return walkers
+
+
+def _fill_buckets(buckets, logs, chats, quests, quest_walkers):
+    """Applies rows to a {(day, pre_stream): DaggerwalkStatsBucket} map, returning the buckets touched."""
+    touched = {}
+
+    def bucket_for(dt):
+        key = get_bucket_key(dt)
+        if key not in buckets:
+            buckets[key] = DaggerwalkStatsBucket(day=key[0], pre_stream=key[1], data=new_bucket_data())
+        touched[key] = buckets[key]
+        return buckets[key]
+
+    for log in logs:
+        bucket = bucket_for(log['created_at'])
+        add_log(bucket.data, log)
+        bucket.last_log_id = max(bucket.last_log_id, log['id'])
+
+    for chat in chats:
+        add_chat(bucket_for(chat['request_log__created_at']).data, chat)
+
+    for quest in quests:
+        if quest.get('completed_at'):
+            add_quest(bucket_for(quest['completed_at']).data, quest, quest_walkers.get(quest['id'], []))
+
+    for bucket in touched.values():
+        _trim_recent_chats(bucket.data)
+    return touched
+
+
+def apply_new_logs_to_buckets():
+    """
+    Applies logs created since the last update, along with their chat commands and any quests
+    completed alongside them, to their day buckets.
+    Returns False when the buckets have never been built so the caller can do a full rebuild.
+    """
+    with transaction.atomic():
+        last_log_id = DaggerwalkStatsBucket.objects.aggregate(m=Max('last_log_id'))['m']
+        if last_log_id is None:
+            return False
+
+        new_logs = list(
+            DaggerwalkLog.objects
+            .filter(id__gt=last_log_id)
+            .order_by('created_at')
+            .values(*LOG_FIELDS)
+        )
+        if not new_logs:
+            return True
+
+        new_chats = (
+            ChatCommandLog.objects
+            .filter(request_log_id__gt=last_log_id)
+            .values(*CHAT_FIELDS)
+        )
+
+        first_day, first_pre_stream = get_bucket_key(new_logs[0]['created_at'])
+        quests_qs = Quest.objects.filter(
+            status='completed',
+            completed_at__gte=get_bucket_start(first_day, first_pre_stream),
+        )
+        quests = list(quests_qs.values(*QUEST_FIELDS))
+        quest_walkers = get_quest_walkers(quests_qs) if quests else {}
+
+        buckets = {
+            (bucket.day, bucket.pre_stream): bucket
+            for bucket in DaggerwalkStatsBucket.objects.select_for_update().filter(day__gte=first_day)
+        }
+        touched = _fill_buckets(buckets, new_logs, new_chats, quests, quest_walkers)
+        for bucket in touched.values():
+            bucket.save()
+
+    logger.info(f"Applied {len(new_logs)} new log(s) to {len(touched)} stats bucket(s)")
+    return True
+
+
+def rebuild_stats_history(chunk_size=HISTORY_CHUNK_SIZE):
+    """
+    Streams the full history once, in chunks, recreating every day bucket along the way.
+    Returns the history as a ColumnarStatsHistory; no per-row dicts are kept in memory.
+    """
+    completed_quests = Quest.objects.filter(status="completed")
+    quest_walkers = get_quest_walkers(completed_quests)
+    history = ColumnarStatsHistory()
+
+    def stream(queryset, append):
+        for row in queryset.iterator(chunk_size=chunk_size):
+            append(row)
+            yield row
+
+    logs = DaggerwalkLog.objects.order_by('created_at').values(*LOG_FIELDS)
+    chats = ChatCommandLog.objects.order_by('-timestamp').values(*CHAT_FIELDS)
+    quests = completed_quests.values(*QUEST_FIELDS)
+
+    buckets = {}
+    _fill_buckets(
+        buckets,
+        stream(logs, history.append_log),
+        stream(chats, history.append_chat),
+        stream(quests, history.append_quest),
+        quest_walkers,
+    )
+    history.finalize(quest_walkers)
+
+    with transaction.atomic():
+        DaggerwalkStatsBucket.objects.all().delete()
+        DaggerwalkStatsBucket.objects.bulk_create(buckets.values())
+
+    logger.info(f"Rebuilt {len(buckets)} stats buckets from {len(history.log_created_at)} logs")
+    return history
+
+
+def render_stats_html(stats):
+    return render_to_string(STATS_TEMPLATE, {
+        'stats': stats,
+        'today': timezone.localtime(timezone.now(), EST_TIMEZONE).date(),
+    })
+
+
+def refresh_stats_caches(full_rebuild=False):
+    """
+    Caches every stats range. Normally only the newest logs are applied to their day buckets and the
+    ranges are merged from those; a full rebuild rescans the history and recreates the buckets.
+    """
+    if full_rebuild or not apply_new_logs_to_buckets():
+        calculate = rebuild_stats_history().calculate
+    else:
+        buckets = list(DaggerwalkStatsBucket.objects.all())
+        calculate = lambda keyword: stats_from_buckets(keyword, buckets)
+
+    for keyword in STATS_RANGES:
+        try:
+            stats = calculate(keyword)
+            cache.set(f"daggerwalk_stats:{keyword}", stats, timeout=None)
+            # The stats API response, pre-rendered along with the stats panel HTML
+            set_json_blob(f"stats:{keyword}", render_json({'stats': stats, 'html': render_stats_html(stats)}))
+        except Exception as e:
+            logger.error(f"Stats calculation failed for {keyword}: {e}")
@@ -1,16 +1,13 @@
-from apps.daggerwalk.serializers import  POISerializer, QuestSerializer, TwitchUserProfileSerializer
-from django.template.loader import render_to_string
-from rest_framework.renderers import JSONRenderer
-from apps.daggerwalk.models import POI, ChatCommandLog, DaggerwalkLog, ProvinceShape, Quest, Region, TwitchUserProfile
-from apps.daggerwalk.utils import calculate_daggerwalk_stats, get_latest_log_data
-from django.db.models import Sum, Count, IntegerField, Max, Max
-from django.db.models.functions import Coalesce
-from playwright.sync_api import sync_playwright
-from datetime import datetime, timedelta
+from apps.daggerwalk.models import DaggerwalkLog, Region
+from apps.daggerwalk.cache_segments import refresh_cache_segments
+from apps.daggerwalk.screenshots import screenshotter
+from apps.daggerwalk.map_render import render_map_image
+from datetime import datetime
 from django.core.cache import cache
 from django.utils import timezone
 from django.conf import settings
 from celery import shared_task
+from concurrent.futures import ThreadPoolExecutor
 from atproto import Client
 from io import BytesIO
 import tempfile
@@ -19,7 +16,8 @@ import logging
 import random
 import httpx
 import time
-import os
+import shutil
+import json
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,31 +25,54 @@ logger = logging.getLogger(__name__)
 
 
 BASE_URL = 'https://kershner.org'
-API_BASE_URL = f'{BASE_URL}/api/daggerwalk'
 TWITCH_CLIP_URL = 'https://api.twitch.tv/helix/clips'
-DAGGERWALK_HOME_HTML_CACHE_KEY = 'daggerwalk_home_html'
+
+CACHE_REBUILD_LOCK_KEY = 'daggerwalk_cache_rebuild_lock'
+CACHE_REBUILD_PENDING_KEY = 'daggerwalk_cache_rebuild_pending'
+CACHE_REBUILD_DIRTY_KEY = 'daggerwalk_cache_rebuild_dirty_since'
+CACHE_REBUILD_FULL_KEY = 'daggerwalk_cache_rebuild_full'
+CACHE_REBUILD_METRICS_KEY = 'daggerwalk_cache_rebuild_metrics'
+CACHE_REBUILD_LOCK_TIMEOUT = 60 * 30
+CACHE_REBUILD_PENDING_TIMEOUT = 60 * 10  # Lets the scheduler recover if a queued task is lost
+CACHE_REBUILD_RETRY_SECONDS = 5
+
+TWITCH_TOKEN_KEY = 'twitch_access_token'
+TWITCH_TOKEN_VALIDATED_KEY = 'twitch_access_token_validated'
+TWITCH_TOKEN_VALIDATE_INTERVAL = 60 * 60
+CLIP_POLL_INITIAL_DELAY = 2
+CLIP_POLL_MAX_DELAY = 15
+CLIP_POLL_MAX_ATTEMPTS = 10  # ~2 minutes of backoff before giving up on the clip
+BLUESKY_VIDEO_MAX_BYTES = 50 * 1024 * 1024
+VIDEO_CHUNK_SIZE = 1024 * 1024
+VIDEO_DOWNLOAD_TIMEOUT = 30
 
 
 def get_valid_access_token():
     """
     Get a valid Twitch access token, refreshing it if necessary.
     Returns the access token string.
+    The token is cached until shortly before it expires and only re-validated with Twitch once per
+    TWITCH_TOKEN_VALIDATE_INTERVAL (Twitch asks for hourly validation), not on every call.
     """
-    logger.info("Getting valid Twitch access token")
-    
     refresh_token = settings.DAGGERWALK_TWITCH_REFRESH_TOKEN
     client_id = settings.DAGGERWALK_TWITCH_CLIENT_ID
     client_secret = settings.DAGGERWALK_TWITCH_SECRET
     
     # Check if we have a cached valid token
-    cached_token = cache.get('twitch_access_token')
+    cached_token = cache.get(TWITCH_TOKEN_KEY)
     if cached_token:
+        if cache.get(TWITCH_TOKEN_VALIDATED_KEY) == cached_token:
+            return cached_token
+
         # Verify the token is still valid
         headers = {'Authorization': f'Bearer {cached_token}', 'Client-Id': client_id}
         validation_response = requests.get('https://id.twitch.tv/oauth2/validate', headers=headers)
         
         if validation_response.status_code == 200:
             logger.info("Using cached valid access token")
+            expires_in = validation_response.json().get('expires_in') or TWITCH_TOKEN_VALIDATE_INTERVAL
+            cache.set(TWITCH_TOKEN_VALIDATED_KEY, cached_token,
+                      timeout=min(TWITCH_TOKEN_VALIDATE_INTERVAL, max(expires_in - 300, 1)))
             return cached_token
         else:
             logger.info("Cached token expired or invalid, refreshing...")
@@ -78,23 +99,34 @@ def get_valid_access_token():
     
     # Cache the token for slightly less than its expiration time to be safe
     cache_timeout = expires_in - 300  # 5 minutes before expiration
-    cache.set('twitch_access_token', new_access_token, timeout=cache_timeout)
+    cache.set(TWITCH_TOKEN_KEY, new_access_token, timeout=cache_timeout)
+    # A freshly issued token doesn't need validating until the next interval
+    cache.set(TWITCH_TOKEN_VALIDATED_KEY, new_access_token,
+              timeout=min(TWITCH_TOKEN_VALIDATE_INTERVAL, cache_timeout))
     
     logger.info(f"New access token cached for {cache_timeout} seconds")
     return new_access_token
 
 
-def create_and_wait_for_clip():
+def forget_access_token():
+    """Drops the cached token after Twitch rejects it, so the next call refreshes it."""
+    cache.delete_many([TWITCH_TOKEN_KEY, TWITCH_TOKEN_VALIDATED_KEY])
+
+
+def get_twitch_headers():
+    return {'Authorization': f'Bearer {get_valid_access_token()}', 'Client-Id': settings.DAGGERWALK_TWITCH_CLIENT_ID}
+
+
+def create_twitch_clip():
+    """Asks Twitch to clip the stream, returning the new clip's ID. The clip takes a few seconds to process."""
     logger.info("Starting Twitch clip creation process")
     
-    token = get_valid_access_token()
-    client_id = settings.DAGGERWALK_TWITCH_CLIENT_ID
     broadcaster_id = settings.DAGGERWALK_TWITCH_BROADCASTER_ID
-    
-    headers = {'Authorization': f'Bearer {token}', 'Client-Id': client_id}
-    r = requests.post(TWITCH_CLIP_URL, headers=headers, params={
+    r = requests.post(TWITCH_CLIP_URL, headers=get_twitch_headers(), params={
         'broadcaster_id': broadcaster_id
     })
+    if r.status_code == 401:
+        forget_access_token()
     
     # 202 Accepted is the correct response for clip creation
     if r.status_code not in [200, 202]:
@@ -103,115 +135,107 @@ def create_and_wait_for_clip():
     
     clip_id = r.json()['data'][0]['id']
     logger.info(f"Clip created with ID: {clip_id}")
-    
-    logger.info("Waiting for clip URL to become available")
-    for attempt in range(20):
-        r = requests.get(TWITCH_CLIP_URL, headers=headers, params={'id': clip_id})
-        data = r.json().get('data')
-        if data and data[0].get('url'):
-            logger.info(f"Clip URL ready: https://clips.twitch.tv/{clip_id}")
-            return clip_id, data[0]
-        time.sleep(3)
-
-    logger.error("Clip URL never became available after 60 seconds")
-    raise Exception("Clip URL never became available")
-
-
-def download_twitch_clip(clip_url):
-    """Download Twitch clip using the official Get Clips Download API"""
-    logger.info(f"Downloading video from: {clip_url}")
-    
-    temp_dir = tempfile.mkdtemp()
-    
+    return clip_id
+
+
+def get_twitch_clip(clip_id):
+    """The clip's data once Twitch has finished processing it (it has a URL), otherwise None."""
+    r = requests.get(TWITCH_CLIP_URL, headers=get_twitch_headers(), params={'id': clip_id})
+    if r.status_code == 401:
+        forget_access_token()
+    if r.status_code != 200:
+        logger.warning(f"Failed to fetch clip {clip_id}: {r.status_code} - {r.text}")
+        return None
+
+    data = r.json().get('data')
+    if data and data[0].get('url'):
+        return data[0]
+    return None
+
+
+def get_clip_poll_delay(attempt):
+    """Seconds to wait before clip check number `attempt` (0-based): 2, 4, 8, 15, 15, ..."""
+    return min(CLIP_POLL_INITIAL_DELAY * 2 ** attempt, CLIP_POLL_MAX_DELAY)
+
+
+def get_twitch_clip_download_url(clip_url):
+    """Get the clip's MP4 download URL using the official Get Clips Download API"""
     # Extract clip ID from URL (e.g., https://clips.twitch.tv/PuzzledGiftedOilVoHiYo-IpnHHbx1Nv_D5Av5)
     clip_id = clip_url.rstrip('/').split('/')[-1]
-    
-    try:
-        # Get access token and client ID
-        token = get_valid_access_token()
-        client_id = settings.DAGGERWALK_TWITCH_CLIENT_ID
-        broadcaster_id = settings.DAGGERWALK_TWITCH_BROADCASTER_ID
-        
-        headers = {'Authorization': f'Bearer {token}', 'Client-Id': client_id}
-        
-        # Use the official Get Clips Download API endpoint
-        # Requires editor:manage:clips or channel:manage:clips scope
-        logger.info(f"Fetching clip download URL for ID: {clip_id}")
-        r = requests.get(
-            'https://api.twitch.tv/helix/clips/downloads',
-            headers=headers,
-            params={
-                'broadcaster_id': broadcaster_id,
-                'editor_id': broadcaster_id,  # Using broadcaster as editor since it's the same account
-                'clip_id': clip_id
-            }
-        )
-        
-        if r.status_code != 200:
-            logger.error(f"Failed to fetch clip download URL: {r.status_code} - {r.text}")
-            raise Exception(f"Failed to fetch clip download URL: {r.status_code}")
-        
-        clip_data = r.json().get('data', [])
-        if not clip_data:
-            raise Exception("No clip download data returned from Twitch API")
-        
-        # Get the landscape download URL
-        download_url = clip_data[0].get('landscape_download_url')
-        if not download_url:
-            raise Exception("No download URL available for clip")
-        
-        logger.info(f"Downloading video from: {download_url}")
-        
-        # Download the video file
-        video_response = requests.get(download_url, stream=True)
-        if video_response.status_code != 200:
-            logger.error(f"Failed to download video: {video_response.status_code}")
-            raise Exception(f"Failed to download video: {video_response.status_code}")
-        
-        # Save video to file
-        filename = os.path.join(temp_dir, f"{clip_id}.mp4")
-        with open(filename, 'wb') as f:
-            for chunk in video_response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        
-        # Verify file was downloaded
-        if not os.path.exists(filename):
-            raise Exception("Downloaded file not found")
-        
-        # Get file info
-        file_size = os.path.getsize(filename) / 1024 / 1024  # MB
-        logger.info(f"Video downloaded successfully: {file_size:.2f} MB")
-        
-        return filename
-        
-    except Exception as e:
-        logger.error(f"Failed to download video: {str(e)}")
-        raise
+    broadcaster_id = settings.DAGGERWALK_TWITCH_BROADCASTER_ID
+
+    # Requires editor:manage:clips or channel:manage:clips scope
+    logger.info(f"Fetching clip download URL for ID: {clip_id}")
+    r = requests.get(
+        'https://api.twitch.tv/helix/clips/downloads',
+        headers=get_twitch_headers(),
+        params={
+            'broadcaster_id': broadcaster_id,
+            'editor_id': broadcaster_id,  # Using broadcaster as editor since it's the same account
+            'clip_id': clip_id
+        }
+    )
+    if r.status_code == 401:
+        forget_access_token()
 
-def upload_video_as_blob(client: Client, video_path: str):
-    logger.info("Uploading video to Bluesky")
+    if r.status_code != 200:
+        logger.error(f"Failed to fetch clip download URL: {r.status_code} - {r.text}")
+        raise Exception(f"Failed to fetch clip download URL: {r.status_code}")
 
-    with open(video_path, 'rb') as f:
-        video_data = f.read()
+    clip_data = r.json().get('data', [])
+    if not clip_data:
+        raise Exception("No clip download data returned from Twitch API")
 
-    file_size = len(video_data)
-    file_size_mb = file_size / 1024 / 1024
+    # Get the landscape download URL
+    download_url = clip_data[0].get('landscape_download_url')
+    if not download_url:
+        raise Exception("No download URL available for clip")
+    return download_url
 
-    if file_size > 50 * 1024 * 1024:
-        logger.error(f"Video file too large: {file_size_mb:.2f} MB (limit: 50 MB)")
-        raise Exception("Video file too large for Bluesky (>50MB)")
 
-    try:
-        blob = client.com.atproto.repo.upload_blob(BytesIO(video_data))
-        logger.info("Video uploaded successfully")
-        return blob.blob
-    except Exception as e:
-        logger.error(f"Failed to upload video: {str(e)}")
-        raise
+def iter_video_chunks(response, limit=BLUESKY_VIDEO_MAX_BYTES):
+    """The response body in VIDEO_CHUNK_SIZE chunks, stopping if it runs past limit (when Content-Length was missing or wrong)."""
+    received = 0
+    for chunk in response.iter_content(chunk_size=VIDEO_CHUNK_SIZE):
+        received += len(chunk)
+        if received > limit:
+            raise Exception(f"Video too large for Bluesky (>{limit / 1024 / 1024:.0f}MB)")
+        yield chunk
+    logger.info(f"Streamed {received / 1024 / 1024:.2f} MB of video")
+
+
+def stream_video_to_bluesky(client: Client, video_url: str):
+    """
+    Pipes the video at video_url straight into a Bluesky blob upload, holding one chunk in memory at a time
+    rather than the whole file. Clips Bluesky would refuse are rejected from Content-Length before downloading.
+    """
+    logger.info(f"Streaming video to Bluesky from: {video_url}")
+
+    with requests.get(video_url, stream=True, timeout=VIDEO_DOWNLOAD_TIMEOUT) as video_response:
+        if video_response.status_code != 200:
+            logger.error(f"Failed to download video: {video_response.status_code}")
+            raise Exception(f"Failed to download video: {video_response.status_code}")
+
+        headers = {'Content-Type': video_response.headers.get('Content-Type', 'video/mp4')}
+        content_length = video_response.headers.get('Content-Length')
+        if content_length:
+            file_size = int(content_length)
+            if file_size > BLUESKY_VIDEO_MAX_BYTES:
+                logger.error(f"Video file too large: {file_size / 1024 / 1024:.2f} MB (limit: 50 MB)")
+                raise Exception("Video file too large for Bluesky (>50MB)")
+            # Sent as a sized body rather than chunked
+            headers['Content-Length'] = content_length
+
+        try:
+            blob = client.com.atproto.repo.upload_blob(None, content=iter_video_chunks(video_response), headers=headers)
+            logger.info("Video uploaded successfully")
+            return blob.blob
+        except Exception as e:
+            logger.error(f"Failed to upload video: {str(e)}")
+            raise
 
 
-def generate_bluesky_caption(log_data, stats_data):
+def generate_bluesky_caption(log_data, stats_data, in_ocean=False):
     def get_qualified_season(date_str):
         season_map = [
             ("Winter", ["eveningstar", "morningstar", "sunsdawn",]),
@@ -260,7 +284,6 @@ def generate_bluesky_caption(log_data, stats_data):
             print(f"Error parsing time: {e}")
             return "Unknown"
 
-    stats_data = stats_data["stats"]
     time_of_day = get_time_of_day(log_data['date']).lower()
     date_without_time = log_data['date'].rsplit(',', 1)[0]
     region_data = log_data['region_fk']
@@ -277,9 +300,9 @@ def generate_bluesky_caption(log_data, stats_data):
     weather_emoji = DaggerwalkLog.get_weather_emoji(log_data['weather'])
     poi_data = log_data['poi']
 
-    if region_name.lower() == "ocean":
+    if in_ocean or region_name.lower() == "ocean":
         try:
-            last_known_region = Region.objects.get(id=log_data['last_known_region'])
+            last_known_region = Region.objects.get(name=log_data['last_known_region'])
             region_string = f"Walking through the ocean near {last_known_region.name} in {last_known_region.province}"
         except Region.DoesNotExist:
             region_string = "Walking through the Ocean."
@@ -366,11 +389,23 @@ def post_video_to_bluesky(caption, video_blob, client: Client):
         raise
 
 
-@shared_task
-def post_to_bluesky():
-    logger.info("Starting Bluesky post process")
-    
-    # Initialize Bluesky client
+def get_cached_post_data():
+    """(latest log, whether the Walker is in the ocean, today's stats) from the caches the site is served from."""
+    latest_log_data = cache.get("daggerwalk_latest_log_data")
+    stats_data = cache.get("daggerwalk_stats:today")
+    if not latest_log_data or stats_data is None:
+        raise Exception("Daggerwalk latest log or stats cache is empty")
+
+    log_data = json.loads(latest_log_data['log'])
+    in_ocean = latest_log_data['in_ocean'] == 'true'
+    if in_ocean:
+        # The cached log is the last one on land with the ocean log's date and weather, so its POI isn't nearby.
+        # last_known_region is the ocean log's region name.
+        log_data.update({'poi': None, 'region': 'Ocean'})
+    return log_data, in_ocean, stats_data
+
+
+def login_to_bluesky():
     client = Client()
     client.request._client.timeout = httpx.Timeout(30.0)
     try:
@@ -379,223 +414,136 @@ def post_to_bluesky():
     except Exception as e:
         logger.error(f"Failed to login to Bluesky: {str(e)}")
         raise
+    return client
+
+
+@shared_task
+def post_to_bluesky():
+    """
+    Starts a Bluesky post: builds the caption from the cached log and stats and asks Twitch for a clip,
+    then hands off to wait_for_twitch_clip, which checks on the clip with backoff as Celery retries so
+    no worker sits idle while Twitch processes it.
+    """
+    logger.info("Starting Bluesky post process")
 
-    # Fetch API data
     try:
-        log_data = requests.get(f"{API_BASE_URL}/logs/?ordering=-id").json()['results'][0]
-        stats_data = requests.get(f"{API_BASE_URL}/stats/?range=today").json()
-        logger.info("Fetched API data successfully")
+        log_data, in_ocean, stats_data = get_cached_post_data()
+        caption = generate_bluesky_caption(log_data, stats_data, in_ocean)
     except Exception as e:
-        logger.error(f"Failed to fetch API data: {str(e)}")
+        logger.error(f"Failed to read cached post data: {str(e)}")
         raise
 
-    # Create and wait for Twitch clip
+    # Create the Twitch clip
     try:
-        clip_id, clip_data = create_and_wait_for_clip()
-        clip_url = f"https://clips.twitch.tv/{clip_id}"
+        clip_id = create_twitch_clip()
     except Exception as e:
         logger.error(f"Failed to create Twitch clip: {str(e)}")
         raise
-    
-    video_path = None
+
+    wait_for_twitch_clip.apply_async(args=[clip_id, caption, log_data['region']], countdown=get_clip_poll_delay(0))
+
+
+@shared_task(bind=True, max_retries=CLIP_POLL_MAX_ATTEMPTS)
+def wait_for_twitch_clip(self, clip_id, caption, region):
+    """Checks whether the clip is ready, retrying later with a growing delay until it is, then posts it."""
+    if get_twitch_clip(clip_id) is None:
+        if self.request.retries >= self.max_retries:
+            logger.error(f"Clip URL never became available after {self.request.retries + 1} checks")
+            raise Exception("Clip URL never became available")
+        countdown = get_clip_poll_delay(self.request.retries + 1)
+        logger.info(f"Clip {clip_id} not ready yet, checking again in {countdown}s")
+        raise self.retry(countdown=countdown)
+
+    logger.info(f"Clip URL ready: https://clips.twitch.tv/{clip_id}")
+    publish_clip_to_bluesky(clip_id, caption, region)
+
+
+def publish_clip_to_bluesky(clip_id, caption, region):
+    """
+    Streams the ready clip to Bluesky and posts it with the screenshot reply.
+    The login, the Twitch download URL lookup and then the video upload run in the background while the
+    screenshots are captured, and the screenshots upload alongside the video.
+    """
+    clip_url = f"https://clips.twitch.tv/{clip_id}"
+    screenshot_dir = tempfile.mkdtemp()
+
     try:
-        # Download the video file
-        video_path = download_twitch_clip(clip_url)
-        
-        # Upload video to Bluesky
-        video_blob = upload_video_as_blob(client, video_path)
-        
-        # Generate text content for the post
-        caption = generate_bluesky_caption(log_data, stats_data)
-        
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            login = pool.submit(login_to_bluesky)
+            download_url = pool.submit(get_twitch_clip_download_url, clip_url)
+            # Stream the clip from Twitch into a Bluesky blob as soon as both are ready
+            video = pool.submit(lambda: stream_video_to_bluesky(login.result(), download_url.result()))
+
+            # Playwright stays on this thread, where the warm browser lives
+            try:
+                screenshots = capture_daggerwalk_bluesky_screenshots(output_dir=screenshot_dir)
+            except Exception as e:
+                logger.error(f"Failed to capture screenshots, posting without them: {str(e)}")
+                screenshots = {}
+
+            client = login.result()
+            try:
+                uploaded = upload_screenshots(client, screenshots, region)
+            except Exception as e:
+                logger.error(f"Failed to upload screenshots: {str(e)}")
+                uploaded = []
+
+            video_blob = video.result()
+
         # Post video to Bluesky
         uri, cid = post_video_to_bluesky(caption, video_blob, client)
 
         # Post screenshots as reply
-        post_screenshot_reply_to_video(client, uri, cid, log_data)
+        if uploaded:
+            post_screenshot_reply_to_video(client, uri, cid, uploaded)
         
         logger.info("Process completed successfully")
         
     except Exception as e:
         logger.error(f"Process failed: {str(e)}")
         raise
-        
-    finally:
-        # Clean up: remove downloaded video file
-        if video_path and os.path.exists(video_path):
-            try:
-                os.remove(video_path)
-                # Also try to remove the temp directory if it's empty
-                temp_dir = os.path.dirname(video_path)
-                if os.path.exists(temp_dir) and not os.listdir(temp_dir):
-                    os.rmdir(temp_dir)
-                logger.info("Cleanup completed")
-            except OSError as e:
-                logger.warning(f"Cleanup warning: {str(e)}")  # Ignore cleanup errors
-
-
-def get_daggerwalk_screenshot_paths(output_dir=None):
-    if output_dir:
-        os.makedirs(output_dir, exist_ok=True)
-        return {
-            'world': os.path.join(output_dir, 'world_map.png'),
-            'quest': os.path.join(output_dir, 'quest.png'),
-        }
 
-    return {
-        'world': 'world_map.png',
-        'quest': 'quest.png',
-    }
+    finally:
+        shutil.rmtree(screenshot_dir, ignore_errors=True)
+        logger.info("Cleanup completed")
 
 
 def capture_daggerwalk_bluesky_screenshots(output_dir=None, base_url=BASE_URL):
     """
     Captures the map and quest screenshots used by the Bluesky reply.
+    The quest panel comes from the browser, the map is drawn with Pillow from the cached map logs.
     """
-    screenshots = get_daggerwalk_screenshot_paths(output_dir)
-
-    def prepare_leaflet_map(page, delay=1.0):
-        """Click fullscreen and prepare the map for screenshots."""
-        logger.info("Waiting for Leaflet map to initialize...")
-        page.wait_for_function(
-            "!!(window.daggerwalkMap && window.daggerwalkMap.setView)",
-            timeout=45000
-        )
-
-        logger.info("Clicking fullscreen button...")
-        try:
-            page.click(".leaflet-control-fullscreen-button", timeout=5000)
-            time.sleep(1)
-        except Exception:
-            logger.warning("Fullscreen button not found or failed to click.")
-        
-        logger.info("Clicking labels button...")
-        try:
-            page.click("#toggle-shapes", timeout=5000)
-            time.sleep(1)
-        except Exception:
-            logger.warning("Labels button not found or failed to click.")
-
-        logger.info("Clicking latest log marker...")
-        try:
-            page.click(".latest-log", timeout=5000)
-            time.sleep(1)
-        except Exception:
-            logger.warning(".latest-log marker not found or failed to click.")
-
-        time.sleep(delay)
-
-        logger.info(f"Hiding UI elements...")
-        page.evaluate("""
-            document.querySelectorAll(
-                '.leaflet-control, .stats-panel, .current-status, .header, .footer, .ui-toolbar, #filters'
-            ).forEach(el => el.style.display = 'none');
-        """)
-
-    def fit_map_to_log_bounds(page, padding=12, target_zoom=2, delay=1.0):
-        logger.info('Fitting map to log marker bounds...')
-        page.evaluate(f"""
-            (() => {{
-                const map = window.daggerwalkMap;
-                if (!map || !window.L) return;
-
-                const bounds = L.latLngBounds();
-
-                map.eachLayer(layer => {{
-                    if (!layer.getLatLng) return;
-
-                    const el = layer.getElement ? layer.getElement() : layer._icon;
-                    if (!el) return;
-
-                    const className = el.className || '';
-
-                    if (
-                        className.includes('log-marker') ||
-                        className.includes('latest-log')
-                    ) {{
-                        bounds.extend(layer.getLatLng());
-                    }}
-                }});
-
-                if (!bounds.isValid()) return;
-
-                map.setView(bounds.getCenter(), {target_zoom}, {{ animate: false }});
-
-                if (map.altImageLayer) {{
-                    map.removeLayer(map.altImageLayer);
-                    map.altImageLayer = null;
-                }}
-
-                const base = map.baseImageLayer?.getElement?.();
-                if (base) base.style.display = '';
-
-                map.invalidateSize();
-            }})();
-        """)
-
-        page.wait_for_timeout(int(delay * 1000))
-
-        logger.info(
-            'Final map zoom: %s',
-            page.evaluate('window.daggerwalkMap && window.daggerwalkMap.getZoom()')
-        )
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=True,
-            executable_path=settings.PLAYWRIGHT_CHROMIUM_PATH
-        )
-        page = browser.new_page(
-            viewport={"width": 1000, "height": 1000},
-            device_scale_factor=2
-        )
-
-        logger.info("Opening Daggerwalk map page...")
-        page.goto(f"{base_url}/daggerwalk", wait_until="networkidle")
-        page.locator("#map").wait_for(state="visible", timeout=30000)
-
-        logger.info("Taking quest screenshot...")
-        quest_element = page.locator(".quests-wrapper").first
-        quest_element.wait_for(state="visible", timeout=30000)
-        quest_element.screenshot(path=screenshots['quest'])
-        logger.info(f"Screenshot saved: {screenshots['quest']}")
+    screenshots = screenshotter.capture(base_url, output_dir=output_dir, include_map=False)
+    start = time.perf_counter()
+    render_map_image(screenshots['world'])
+    logger.info(f"Rendered Daggerwalk map image in {time.perf_counter() - start:.2f}s")
+    return screenshots
 
-        prepare_leaflet_map(page, delay=1.5)
-        fit_map_to_log_bounds(page, padding=12, target_zoom=2, delay=1.0)
 
-        logger.info("Taking map screenshot...")
-        page.locator("#map").screenshot(path=screenshots['world'])
-        logger.info(f"Screenshot saved: {screenshots['world']}")
+def upload_screenshots(client: Client, screenshots, region):
+    """Uploads the captured screenshots as image blobs with their alt text, ready for the reply."""
+    uploaded = []
+    for label, path in screenshots.items():
+        with open(path, "rb") as f:
+            blob = client.com.atproto.repo.upload_blob(BytesIO(f.read()))
 
-        browser.close()
+        if label == "world":
+            alt = f"Daggerfall world map with markers showing the Walker's travels for the past day.  The Walker is currently in the {region} region."
+        elif label == "quest":
+            alt = f"An image of the Walker's current quest featuring art assets from the original Daggerfall game."
 
-    return screenshots
+        uploaded.append({
+            "image": blob.blob,
+            "alt": alt
+        })
+    return uploaded
 
 
-def post_screenshot_reply_to_video(client: Client, uri: str, cid: str, log_data):
+def post_screenshot_reply_to_video(client: Client, uri: str, cid: str, uploaded):
     """
-    Captures screenshots of the map and quest elements and posts them as a reply to the specified video post.
+    Posts the uploaded screenshots as a reply to the specified video post.
     """
-    screenshots = capture_daggerwalk_bluesky_screenshots()
-
     try:
-        # Upload screenshots
-        uploaded = []
-        for label, path in screenshots.items():
-            with open(path, "rb") as f:
-                blob = client.com.atproto.repo.upload_blob(BytesIO(f.read()))
-
-                region = log_data['region']
-                if label == "world":
-                    alt = f"Daggerfall world map with markers showing the Walker's travels for the past day.  The Walker is currently in the {region} region."
-                elif label == "quest":
-                    alt = f"An image of the Walker's current quest featuring art assets from the original Daggerfall game."
-
-                uploaded.append({
-                    "image": blob.blob,
-                    "alt": alt
-                })
-
         # Post reply
         url = "https://kershner.org/daggerwalk"
         text = f"The Walker's recent travels:\n{url}"
@@ -634,163 +582,73 @@ def post_screenshot_reply_to_video(client: Client, uri: str, cid: str, log_data)
         logger.error(f"Failed to post screenshot reply: {str(e)}")
         raise
 
-    finally:
-        # Clean up
-        for path in screenshots.values():
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                    logger.info(f"Deleted screenshot: {path}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete screenshot {path}: {str(e)}")
+def _incr_rebuild_metric(name):
+    key = f"{CACHE_REBUILD_METRICS_KEY}:{name}"
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key)
 
-@shared_task
-def update_all_daggerwalk_caches():
-    # 1. Region data
-    region_data = (
-        DaggerwalkLog.objects
-        .exclude(region="Ocean")
-        .select_related('region_fk')
-        .values("region", "region_fk__province")
-        .annotate(
-            latest_date=Max("created_at"),
-            latest_location=Max("location"),
-            latest_weather=Max("weather"),
-            latest_current_song=Max("current_song"),
-        )
-        .order_by("-latest_date")
-    )
-    cache.set("daggerwalk_region_data", list(region_data), timeout=None)
-
-    # 2. Latest log
-    latest_log_data = get_latest_log_data()
-    cache.set("daggerwalk_latest_log_data", latest_log_data, timeout=None)
-
-    # 3. Stats slices
-    all_logs = list(
-        DaggerwalkLog.objects
-        .select_related('region_fk', 'poi')
-        .order_by('created_at')
-        .values(
-            'id', 'created_at', 'player_x', 'player_z', 'date', 'season',
-            'region', 'weather', 'current_song', 'poi__name', 'poi__emoji',
-            'region_fk__name'
-        )
-    )
-    
-    all_chats = list(
-        ChatCommandLog.objects
-        .select_related('request_log')
-        .order_by('-timestamp')
-        .values(
-            'id', 'request_log__created_at', 'timestamp', 'user', 
-            'command', 'args', 'raw'
-        )
-    )
-    
-    all_quests = list(
-        Quest.objects
-        .filter(status="completed")
-        .values('id', 'created_at', 'completed_at', 'xp')
-    )
-    
-    for keyword in ['all', 'today', 'yesterday', 'last_7_days', 'this_month']:
-        try:
-            stats = calculate_daggerwalk_stats(keyword, all_logs, all_chats, all_quests)
-            cache.set(f"daggerwalk_stats:{keyword}", stats, timeout=None)
-        except Exception as e:
-            logger.error(f"Stats calculation failed for {keyword}: {e}")
-
-    # 4. Current and previous quests
-    current_quest = (
-        Quest.objects
-        .filter(status="in_progress")
-        .select_related("poi", "poi__region")
-        .order_by("-created_at")
-        .first()
-    )
-    cache.set("daggerwalk_current_quest", current_quest, timeout=None)
 
-    previous_quests = (
-        Quest.objects
-        .filter(status="completed")
-        .select_related("poi", "poi__region")
-        .order_by("-created_at")[:10]
-    )
-    cache.set("daggerwalk_previous_quests", previous_quests, timeout=None)
-
-    # 5. Leaderboard
-    total_leaderboard_rows = 100
-    excluded_usernames = ["billcrystals", "daggerwalk", "daggerwalk_bot"]
-    leaders_qs = (
-        TwitchUserProfile.objects
-        .annotate(
-            total_xp_value=Coalesce(Sum("completed_quests__xp"), 0, output_field=IntegerField()),
-            completed_quests_count=Count("completed_quests", distinct=True),
-        )
-        .filter(total_xp_value__gt=0)
-        .exclude(twitch_username__in=excluded_usernames)
-        .order_by("-total_xp_value", "twitch_username")[:total_leaderboard_rows]
-    )
-    leaderboard_data = TwitchUserProfileSerializer(leaders_qs, many=True).data
-    cache.set("daggerwalk_leaderboard", leaderboard_data, timeout=None)
-
-    # 6. Map logs (downsample + include related fields)
-    two_weeks_ago = timezone.now() - timedelta(weeks=2)
-    logs_qs = (
-        DaggerwalkLog.objects
-        .filter(created_at__gte=two_weeks_ago)
-        .select_related("region_fk", "poi")
-        .values(
-            "id", "map_pixel_x", "map_pixel_y",
-            "region", "location", "weather", "season", "current_song", "created_at",
-            "date", "created_at",
-            "region_fk__name", "region_fk__province", "region_fk__climate", "region_fk__emoji",
-            "poi__name", "poi__emoji", "poi__type"
-        )
-        .order_by("id")
-    )
+def get_cache_rebuild_metrics():
+    keys = {f"{CACHE_REBUILD_METRICS_KEY}:{name}": name for name in ('requested', 'enqueued', 'collapsed', 'runs')}
+    values = cache.get_many(list(keys))
+    return {name: values.get(key, 0) for key, name in keys.items()}
+
 
-    logs_list = list(logs_qs)
-    if len(logs_list) > 2:
-        latest_logs = logs_list[-5:]  # always include most recent 5
-        remaining_logs = logs_list[:-5]
-        step = 3
-        sampled = [remaining_logs[0]] + remaining_logs[1:-1:step] + [remaining_logs[-1]] if remaining_logs else []
-        combined = sampled + latest_logs
+def schedule_daggerwalk_cache_rebuild(full_rebuild=False):
+    """
+    Requests a Daggerwalk cache rebuild, coalescing bursts of requests.
+    At most one rebuild runs at a time and at most one more is queued behind it; requests that
+    arrive while a rebuild is already queued are folded into that one.
+    """
+    _incr_rebuild_metric('requested')
+    cache.add(CACHE_REBUILD_DIRTY_KEY, timezone.now().timestamp(), timeout=None)
+    if full_rebuild:
+        cache.set(CACHE_REBUILD_FULL_KEY, True, timeout=None)
+
+    if cache.add(CACHE_REBUILD_PENDING_KEY, True, timeout=CACHE_REBUILD_PENDING_TIMEOUT):
+        _incr_rebuild_metric('enqueued')
+        update_all_daggerwalk_caches.delay()
     else:
-        combined = logs_list
+        _incr_rebuild_metric('collapsed')
 
-    cache.set("daggerwalk_map_logs", combined, timeout=None)
 
-    # 7. POIs + quests + shapes
-    pois_qs = POI.objects.select_related('region').all()
-    poi_json = POISerializer(pois_qs, many=True).data
-    cache.set("daggerwalk_map_pois", poi_json, timeout=None)
-    
-    quest_qs = Quest.objects.filter(status="in_progress").select_related("poi", "poi__region")
-    quest_json = QuestSerializer(quest_qs, many=True).data
-    cache.set("daggerwalk_map_quest", quest_json, timeout=None)
-
-    shape_data = []
-    for shape in ProvinceShape.objects.select_related("region"):
-        shape_data.append({
-            "name": shape.region.name,
-            "province": shape.region.province,
-            "coordinates": shape.coordinates,
-        })
-    cache.set("daggerwalk_map_shape_data", shape_data, timeout=None)
-
-    # 8. Rendered home page HTML
-    quest_data = QuestSerializer(current_quest).data if current_quest else None
-    html = render_to_string('daggerwalk/index.html', {
-        "current_quest": current_quest,
-        "previous_quests": previous_quests,
-        "current_quest_json": JSONRenderer().render(quest_data).decode("utf-8"),
-        "leaderboard": leaderboard_data,
-        "logs_json": combined,
-        "poi_json": poi_json,
-        "quest_json": quest_json,
-        "shape_data": shape_data,
-    })
-    cache.set(DAGGERWALK_HOME_HTML_CACHE_KEY, html, timeout=None)
\ No newline at end of file
+@shared_task(bind=True, max_retries=None)
+def update_all_daggerwalk_caches(self, full_rebuild=False):
+    lock = cache.lock(CACHE_REBUILD_LOCK_KEY, timeout=CACHE_REBUILD_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        # Another rebuild is running - stay queued (and keep the pending flag alive) until it's done
+        cache.touch(CACHE_REBUILD_PENDING_KEY, CACHE_REBUILD_PENDING_TIMEOUT)
+        raise self.retry(countdown=CACHE_REBUILD_RETRY_SECONDS)
+
+    try:
+        # Requests from this point on queue a single follow-up rebuild
+        cache.delete(CACHE_REBUILD_PENDING_KEY)
+        dirty_since = cache.get(CACHE_REBUILD_DIRTY_KEY)
+        full_rebuild = full_rebuild or bool(cache.get(CACHE_REBUILD_FULL_KEY))
+        cache.delete_many([CACHE_REBUILD_DIRTY_KEY, CACHE_REBUILD_FULL_KEY])
+
+        start = time.perf_counter()
+        try:
+            rebuild_daggerwalk_caches(full_rebuild=full_rebuild)
+        except Exception:
+            # Put the flags back so the next rebuild still covers these requests (and a requested full rebuild)
+            cache.add(CACHE_REBUILD_DIRTY_KEY, dirty_since or timezone.now().timestamp(), timeout=None)
+            if full_rebuild:
+                cache.set(CACHE_REBUILD_FULL_KEY, True, timeout=None)
+            raise
+        _incr_rebuild_metric('runs')
+
+        lag = f"{timezone.now().timestamp() - dirty_since:.1f}s" if dirty_since else "n/a"
+        logger.info(
+            f"Daggerwalk caches rebuilt in {time.perf_counter() - start:.2f}s (lag since first request: {lag}) "
+            f"- {get_cache_rebuild_metrics()}"
+        )
+    finally:
+        lock.release()
+
+
+def rebuild_daggerwalk_caches(full_rebuild=False):
+    """Refreshes the cache segments affected by changes since the last rebuild (all of them for a full rebuild)."""
+    rebuilt = refresh_cache_segments(full_rebuild=full_rebuild)
+    logger.info(f"Daggerwalk cache segments rebuilt: {', '.join(rebuilt) or 'none'}")
+    return rebuilt
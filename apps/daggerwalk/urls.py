@@ -4,8 +4,10 @@ from django.urls import path
 daggerwalk_patterns = [
     path('', daggerwalk_views.DaggerwalkHomeView.as_view(), name='daggerwalk'),
     path('refresh-data/', daggerwalk_views.daggerwalk_refresh_data, name='daggerwalk_refresh_data'),
+    path('map/geometry/<str:version>.json', daggerwalk_views.daggerwalk_map_geometry, name='daggerwalk_map_geometry'),
     path('data/', daggerwalk_views.DaggerwalkHomeDataView.as_view(), name='daggerwalk_data'),
     path('logs/latest/', daggerwalk_views.latest_log, name='daggerwalk_latest_log'),
+    path('logs/stream/', daggerwalk_views.latest_log_stream, name='daggerwalk_latest_log_stream'),
     path('log/', daggerwalk_views.create_daggerwalk_log, name='daggerwalk_log'),
     path("quest/", daggerwalk_views.quest_redirect_view, name="quest"),
     path("admin/build-daggerwalk-caches/", daggerwalk_views.build_daggerwalk_caches, name="admin-build-daggerwalk-caches"),
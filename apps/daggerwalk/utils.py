@@ -1,6 +1,5 @@
-from apps.daggerwalk.models import DaggerwalkLog, ChatCommandLog, Quest, TwitchUserProfile
+from apps.daggerwalk.models import DaggerwalkLog
 from apps.daggerwalk.serializers import DaggerwalkLogSerializer
-from django.db.models import Min, Max, Count, Sum
 from datetime import timedelta, datetime
 from django.utils import timezone
 import pytz
@@ -115,66 +114,40 @@ def get_top_values_by_time_counts(value_counts, attr, top_n=10):
         results.append(entry)
     return results
 
-def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests):
-    def format_last_seen(dt):
-        if not isinstance(dt, datetime):
-            return None
-        dt_local = dt.astimezone(EST_TIMEZONE)
-        try:
-            return dt_local.strftime('%B %-d, %-I:%M %p')
-        except ValueError:
-            return dt_local.strftime('%B %d, %I:%M %p')
-
-    if range_keyword not in (ranges := get_stats_date_ranges()) and range_keyword != 'all':
-        raise ValueError(f'Invalid range: {range_keyword}. Must be one of: {", ".join(list(ranges) + ["all"])}')
+def format_last_seen(dt):
+    if not isinstance(dt, datetime):
+        return None
+    dt_local = dt.astimezone(EST_TIMEZONE)
+    try:
+        return dt_local.strftime('%B %-d, %-I:%M %p')
+    except ValueError:
+        return dt_local.strftime('%B %d, %I:%M %p')
 
-    # Determine date range and filter logs
-    if range_keyword == 'all':
-        if not all_logs:
-            raise ValueError('No logs available.')
-        start_datetime = all_logs[0]['created_at']
-        end_datetime = all_logs[-1]['created_at']
-        filtered_logs = all_logs
-        # For 'all', no UTC conversion needed since we use all logs
-        start_datetime_utc = start_datetime
-        end_datetime_utc = end_datetime
-    else:
-        start_datetime, end_datetime = ranges[range_keyword]
-        # Convert to UTC for comparison (logs are stored in UTC)
-        start_datetime_utc = start_datetime.astimezone(pytz.UTC)
-        end_datetime_utc = end_datetime.astimezone(pytz.UTC)
-        
-        # Filter by datetime (not just date) to respect streaming day hours
-        filtered_logs = [
-            log for log in all_logs 
-            if start_datetime_utc <= log['created_at'] <= end_datetime_utc
-        ]
-    
-    # Convert to dates for display purposes
-    start_date = start_datetime.date() if hasattr(start_datetime, 'date') else start_datetime
-    end_date = end_datetime.date() if hasattr(end_datetime, 'date') else end_datetime
-    
-    filtered_chats = [
-        chat for chat in all_chats
-        if start_datetime_utc <= chat['request_log__created_at'] <= end_datetime_utc
-    ]
-    
-    filtered_quests = [
-        quest for quest in all_quests
-        if quest.get('completed_at') and start_datetime_utc <= quest['completed_at'] <= end_datetime_utc
-    ]
+def get_top_values(items_dict, attr_name, top_n=10):
+    results = []
+    sorted_items = sorted(items_dict.items(), key=lambda x: x[1], reverse=True)[:top_n]
+    for value, count in sorted_items:
+        entry = {
+            'name': value,
+            'time': format_minutes(count * 5)
+        }
+        if attr_name == 'weather':
+            entry['emoji'] = DaggerwalkLog.get_weather_emoji(value)
+        results.append(entry)
+    return results
 
+def summarize_daggerwalk_stats(start_date, end_date, *, total_logs, total_distance_km,
+                               first_entry, last_entry, region_data, poi_data, song_counts,
+                               weather_counts, unique_days, cmd_counts, user_counts, last_100,
+                               quest_count, quest_durations, total_xp, walkers_with_xp):
+    """
+    Builds the stats payload from pre-aggregated values.
+    Shared by the full-history scan and the incremental day buckets so both produce identical output.
+    """
     # Chat command stats
-    total_cmds = len(filtered_chats)
-    unique_users = set(chat['user'] for chat in filtered_chats)
-    walker_count = len(unique_users)
-    
-    cmd_counts = {}
-    user_counts = {}
-    for chat in filtered_chats:
-        cmd_counts[chat['command']] = cmd_counts.get(chat['command'], 0) + 1
-        user_counts[chat['user']] = user_counts.get(chat['user'], 0) + 1
-    
+    total_cmds = sum(cmd_counts.values())
+    walker_count = len(user_counts)
+
     most_common_cmd = max(cmd_counts.items(), key=lambda x: x[1])[0] if cmd_counts else None
     
     command_summary = {
@@ -186,7 +159,6 @@ def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests):
 
     top_cmds = sorted(cmd_counts.items(), key=lambda x: x[1], reverse=True)[:10]
     top_users = sorted(user_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    last_100 = filtered_chats[:100]
     
     chat_command_stats = {
         "total": total_cmds,
@@ -208,7 +180,6 @@ def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests):
         ],
     }
 
-    total_logs = len(filtered_logs)
     if total_logs == 0:
         return {
             'startDate': start_date.isoformat(),
@@ -233,26 +204,12 @@ def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests):
     # Calculate walking time from actual time span instead of log count
     # (to account for duplicate logs created in quick succession)
     if total_logs > 1:
-        first_time = filtered_logs[0]['created_at']
-        last_time = filtered_logs[-1]['created_at']
-        time_diff_minutes = (last_time - first_time).total_seconds() / 60
+        time_diff_minutes = (last_entry['created_at'] - first_entry['created_at']).total_seconds() / 60
         total_minutes = int(time_diff_minutes)
     else:
         total_minutes = total_logs * 5
 
-    # Calculate total distance traveled
-    total_distance_km = 0.0
-    prev_x = prev_z = None
-    for log in filtered_logs:
-        fx, fz = float(log['player_x']), float(log['player_z'])
-        if prev_x is not None and prev_z is not None:
-            dx = fx - prev_x
-            dz = fz - prev_z
-            total_distance_km += math.sqrt(dx * dx + dz * dz) / 1000.0
-        prev_x, prev_z = fx, fz
-
     # Quest stats
-    quest_count = len(filtered_quests)
     quest_stats = {
         "completedQuests": quest_count,
         "avgQuestTime": None,
@@ -262,24 +219,8 @@ def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests):
     }
     
     if quest_count > 0:
-        dur_minutes = [
-            int((q['completed_at'] - q['created_at']).total_seconds() / 60)
-            for q in filtered_quests
-            if q.get('created_at') and q.get('completed_at')
-        ]
-        avg_duration = (sum(dur_minutes) / len(dur_minutes)) if dur_minutes else 0
-        total_xp = sum(q.get('xp', 0) for q in filtered_quests)
-        
-        walkers_with_xp = (
-            TwitchUserProfile.objects.filter(
-                completed_quests__status="completed",
-                completed_quests__completed_at__range=(start_datetime, end_datetime),
-            )
-            .values("id")
-            .distinct()
-            .count()
-        )
-        
+        duration_total, duration_count = quest_durations
+        avg_duration = (duration_total / duration_count) if duration_count else 0
         avg_distance_traveled = float(total_distance_km) / quest_count if quest_count else 0.0
 
         quest_stats.update({
@@ -290,15 +231,6 @@ def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests):
         })
 
     # Region frequency and last seen
-    region_data = {}
-    for log in filtered_logs:
-        region = log['region']
-        if region not in region_data:
-            region_data[region] = {'count': 0, 'last_seen': log['created_at']}
-        region_data[region]['count'] += 1
-        if log['created_at'] > region_data[region]['last_seen']:
-            region_data[region]['last_seen'] = log['created_at']
-    
     region_stats = sorted(region_data.items(), key=lambda x: x[1]['count'], reverse=True)[:10]
     mostVisitedRegions = sorted(
         [
@@ -313,12 +245,6 @@ def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests):
     )
 
     # POI stats
-    poi_data = {}
-    for log in filtered_logs:
-        if log.get('poi__name'):
-            key = (log['poi__name'], log.get('region_fk__name'), log.get('poi__emoji'))
-            poi_data[key] = poi_data.get(key, 0) + 1
-    
     top_pois = sorted(poi_data.items(), key=lambda x: x[1], reverse=True)[:10]
     topPOIsVisited = [
         {
@@ -331,47 +257,13 @@ def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests):
     ]
 
     # Song stats
-    song_counts = {}
-    for log in filtered_logs:
-        if log.get('current_song'):
-            song = log['current_song']
-            song_counts[song] = song_counts.get(song, 0) + 1
-    
     song_items = sorted(song_counts.items(), key=lambda x: x[1], reverse=True)
     most_common_song = song_items[0][0] if song_items else None
-    total_songs_heard = len(song_counts)
 
     # Weather stats
-    weather_counts = {}
-    for log in filtered_logs:
-        weather = log['weather']
-        weather_counts[weather] = weather_counts.get(weather, 0) + 1
-    
     weather_items = sorted(weather_counts.items(), key=lambda x: x[1], reverse=True)
     most_common_weather = weather_items[0][0] if weather_items else None
 
-    # In-game time range and unique days
-    first_entry = filtered_logs[0] if filtered_logs else None
-    last_entry = filtered_logs[-1] if filtered_logs else None
-
-    unique_days = set()
-    for log in filtered_logs:
-        if log.get('date'):
-            unique_days.add(extract_date_key(log['date']))
-
-    def get_top_values(items_dict, attr_name, top_n=10):
-        results = []
-        sorted_items = sorted(items_dict.items(), key=lambda x: x[1], reverse=True)[:top_n]
-        for value, count in sorted_items:
-            entry = {
-                'name': value,
-                'time': format_minutes(count * 5)
-            }
-            if attr_name == 'weather':
-                entry['emoji'] = DaggerwalkLog.get_weather_emoji(value)
-            results.append(entry)
-        return results
-
     return {
         'startDate': start_date.isoformat(),
         'endDate': end_date.isoformat(),
@@ -383,17 +275,132 @@ def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests):
         'mostCommonWeather': most_common_weather,
         'topPOIsVisited': topPOIsVisited,
         'mostCommonSong': most_common_song,
-        'totalSongsHeard': total_songs_heard,
+        'totalSongsHeard': len(song_counts),
         'topSongs': get_top_values(song_counts, 'current_song'),
         'topWeather': get_top_values(weather_counts, 'weather'),
         'inGameTimeRange': {
-            "startDate": extract_date_key(first_entry['date']) if first_entry else None,
-            "endDate": extract_date_key(last_entry['date']) if last_entry else None,
-            "startSeason": first_entry.get('season') if first_entry else None,
-            "endSeason": last_entry.get('season') if last_entry else None,
+            "startDate": extract_date_key(first_entry['date']),
+            "endDate": extract_date_key(last_entry['date']),
+            "startSeason": first_entry.get('season'),
+            "endSeason": last_entry.get('season'),
             "uniqueDays": len(unique_days),
         },
         'chatCommandStats': chat_command_stats,
         'commandSummary': command_summary,
         'questStats': quest_stats,
-    }
\ No newline at end of file
+    }
+
+def calculate_daggerwalk_stats(range_keyword, all_logs, all_chats, all_quests, quest_walkers):
+    """quest_walkers maps quest id -> participant profile ids (see stats.get_quest_walkers)."""
+    if range_keyword not in (ranges := get_stats_date_ranges()) and range_keyword != 'all':
+        raise ValueError(f'Invalid range: {range_keyword}. Must be one of: {", ".join(list(ranges) + ["all"])}')
+
+    # Determine date range and filter logs
+    if range_keyword == 'all':
+        if not all_logs:
+            raise ValueError('No logs available.')
+        start_datetime = all_logs[0]['created_at']
+        end_datetime = all_logs[-1]['created_at']
+        filtered_logs = all_logs
+        # For 'all', no UTC conversion needed since we use all logs
+        start_datetime_utc = start_datetime
+        end_datetime_utc = end_datetime
+    else:
+        start_datetime, end_datetime = ranges[range_keyword]
+        # Convert to UTC for comparison (logs are stored in UTC)
+        start_datetime_utc = start_datetime.astimezone(pytz.UTC)
+        end_datetime_utc = end_datetime.astimezone(pytz.UTC)
+        
+        # Filter by datetime (not just date) to respect streaming day hours
+        filtered_logs = [
+            log for log in all_logs 
+            if start_datetime_utc <= log['created_at'] <= end_datetime_utc
+        ]
+    
+    # Convert to dates for display purposes
+    start_date = start_datetime.date() if hasattr(start_datetime, 'date') else start_datetime
+    end_date = end_datetime.date() if hasattr(end_datetime, 'date') else end_datetime
+    
+    filtered_chats = [
+        chat for chat in all_chats
+        if start_datetime_utc <= chat['request_log__created_at'] <= end_datetime_utc
+    ]
+    
+    filtered_quests = [
+        quest for quest in all_quests
+        if quest.get('completed_at') and start_datetime_utc <= quest['completed_at'] <= end_datetime_utc
+    ]
+
+    cmd_counts = {}
+    user_counts = {}
+    for chat in filtered_chats:
+        cmd_counts[chat['command']] = cmd_counts.get(chat['command'], 0) + 1
+        user_counts[chat['user']] = user_counts.get(chat['user'], 0) + 1
+
+    # Calculate total distance traveled
+    total_distance_km = 0.0
+    prev_x = prev_z = None
+    for log in filtered_logs:
+        fx, fz = float(log['player_x']), float(log['player_z'])
+        if prev_x is not None and prev_z is not None:
+            dx = fx - prev_x
+            dz = fz - prev_z
+            total_distance_km += math.sqrt(dx * dx + dz * dz) / 1000.0
+        prev_x, prev_z = fx, fz
+
+    # Quest durations and participants
+    dur_minutes = [
+        int((q['completed_at'] - q['created_at']).total_seconds() / 60)
+        for q in filtered_quests
+        if q.get('created_at') and q.get('completed_at')
+    ]
+    walkers_with_xp = len({
+        profile_id
+        for q in filtered_quests
+        for profile_id in quest_walkers.get(q['id'], ())
+    })
+
+    # Region frequency and last seen
+    region_data = {}
+    for log in filtered_logs:
+        region = log['region']
+        if region not in region_data:
+            region_data[region] = {'count': 0, 'last_seen': log['created_at']}
+        region_data[region]['count'] += 1
+        if log['created_at'] > region_data[region]['last_seen']:
+            region_data[region]['last_seen'] = log['created_at']
+
+    # POI, song and weather counts, unique in-game days
+    poi_data = {}
+    song_counts = {}
+    weather_counts = {}
+    unique_days = set()
+    for log in filtered_logs:
+        if log.get('poi__name'):
+            key = (log['poi__name'], log.get('region_fk__name'), log.get('poi__emoji'))
+            poi_data[key] = poi_data.get(key, 0) + 1
+        if log.get('current_song'):
+            song_counts[log['current_song']] = song_counts.get(log['current_song'], 0) + 1
+        weather_counts[log['weather']] = weather_counts.get(log['weather'], 0) + 1
+        if log.get('date'):
+            unique_days.add(extract_date_key(log['date']))
+
+    return summarize_daggerwalk_stats(
+        start_date, end_date,
+        total_logs=len(filtered_logs),
+        total_distance_km=total_distance_km,
+        first_entry=filtered_logs[0] if filtered_logs else None,
+        last_entry=filtered_logs[-1] if filtered_logs else None,
+        region_data=region_data,
+        poi_data=poi_data,
+        song_counts=song_counts,
+        weather_counts=weather_counts,
+        unique_days=unique_days,
+        cmd_counts=cmd_counts,
+        user_counts=user_counts,
+        last_100=filtered_chats[:100],
+        quest_count=len(filtered_quests),
+        quest_durations=(sum(dur_minutes), len(dur_minutes)),
+        total_xp=sum(q.get('xp', 0) for q in filtered_quests),
+        walkers_with_xp=walkers_with_xp,
+    )
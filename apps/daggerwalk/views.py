@@ -1,33 +1,39 @@
-from .models import POI, DaggerwalkLog, Quest, Region, ChatCommandLog, TwitchUserProfile
+from .models import POI, DaggerwalkLog, Quest, Region, ChatCommandLog
 from django.contrib.admin.views.decorators import staff_member_required
 from rest_framework.decorators import api_view, permission_classes
 from apps.daggerwalk.quest_gen import complete_and_rotate_quest
-from apps.daggerwalk.tasks import update_all_daggerwalk_caches
+from apps.daggerwalk.tasks import get_cache_rebuild_metrics, schedule_daggerwalk_cache_rebuild
+from apps.daggerwalk.cache_segments import (
+    MAP_DATA_KEYS,
+    MAP_PARTS_CACHE_KEY,
+    MAP_VERSIONS_CACHE_KEY,
+    build_map_geometry,
+    get_daggerwalk_home_context,
+    get_daggerwalk_home_html,
+)
+from apps.daggerwalk.json_blobs import json_blob_response, render_json
+from apps.daggerwalk.map_geometry import get_map_geometry
+from apps.daggerwalk.stats import render_stats_html
+from apps.daggerwalk.live import publish_latest_log
+from apps.daggerwalk.ingest import get_active_quest, ingest_daggerwalk_log
 from django.views.decorators.cache import cache_control
+from django.utils.cache import patch_cache_control
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.template.loader import render_to_string
-from django.utils.dateparse import parse_datetime
-from rest_framework.renderers import JSONRenderer
+from django.db import transaction
 from apps.daggerwalk.models import ChatCommandLog
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.db.models.functions import Lower
 from apps.api.views import BaseListAPIView
 from rest_framework.views import APIView
-from django.utils.text import slugify
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.core.cache import cache
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified
 from urllib.parse import urlencode
 from rest_framework import status
-from django.utils import timezone
-from .models import ProvinceShape
 from django.urls import reverse
-from datetime import timedelta
-from .utils import EST_TIMEZONE
 from django.conf import settings
 from .serializers import (
     ChatCommandLogSerializer,
@@ -37,12 +43,13 @@ from .serializers import (
     RegionSerializer,
 )
 import logging
+import bisect
 
 
 logger = logging.getLogger(__name__)
 
 
-DAGGERWALK_HOME_HTML_CACHE_KEY = 'daggerwalk_home_html'
+MAP_GEOMETRY_MAX_AGE = 60 * 60 * 24 * 365  # The URL changes with the content
 
 
 # @method_decorator(cache_page(60 * 60 * 24 * 30), name="dispatch")  # 30 days
@@ -52,46 +59,120 @@ class DaggerwalkHomeView(APIView):
     template_path = 'daggerwalk/index.html'
 
     def get(self, request):
-        html = cache.get(DAGGERWALK_HOME_HTML_CACHE_KEY)
+        # A miss (after a cache clear or Redis restart) is rendered by one worker, which also queues a cache rebuild
+        html = get_daggerwalk_home_html(on_miss=schedule_daggerwalk_cache_rebuild)
         if html is not None:
             return HttpResponse(html)
 
-        logger.warning('Daggerwalk home HTML cache miss')
-        quest = cache.get("daggerwalk_current_quest")
-        previous_quests = cache.get("daggerwalk_previous_quests") or []
-        quest_data = QuestSerializer(quest).data if quest else None
-        return render(request, self.template_path, {
-            "current_quest": quest,
-            "previous_quests": previous_quests,
-            "current_quest_json": JSONRenderer().render(quest_data).decode("utf-8"),
-            "leaderboard": cache.get("daggerwalk_leaderboard") or [],
-            "logs_json": cache.get("daggerwalk_map_logs") or [],
-            "poi_json": cache.get("daggerwalk_map_pois") or [],
-            "quest_json": cache.get("daggerwalk_map_quest") or [],
-            "shape_data": cache.get("daggerwalk_map_shape_data") or [],
-        })
+        return render(request, self.template_path, get_daggerwalk_home_context())
     
 
+def get_appended_map_logs(parts, logs_version, since_id):
+    """
+    The pre-rendered logs to append for a client holding logs_version (newest id since_id), or None if it
+    needs the full list. Appending is only right when the client's logs that are still in the window are
+    exactly the server's logs up to since_id - simplification can drop or add older points between builds.
+    The client drops its logs before logs_first_id, which have aged out of the window.
+    """
+    log_ids = parts['log_ids']
+    client_ids = parts.get('log_history', {}).get(logs_version)
+    if not (since_id and log_ids and client_ids and client_ids[-1] == since_id):
+        return None
+
+    split = bisect.bisect_right(log_ids, since_id)
+    if client_ids[bisect.bisect_left(client_ids, log_ids[0]):] != log_ids[:split]:
+        return None
+    return parts['log_items'][split:]
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
-@cache_control(no_cache=True, no_store=True, must_revalidate=True)
+@cache_control(no_cache=True, must_revalidate=True)
 def daggerwalk_refresh_data(request):
-    """Fetch latest map data without reloading the page."""
-    data = {
-        "logs": cache.get("daggerwalk_map_logs") or [],
-        "pois": cache.get("daggerwalk_map_pois") or [],
-        "quests": cache.get("daggerwalk_map_quest") or [],
-        "shapes": cache.get("daggerwalk_map_shape_data") or [],
-    }
-    return Response(data)
+    """
+    Fetch latest map data without reloading the page.
+    Clients that pass since_id (the newest log id they have) and the versions from their last
+    response only get what changed: logs appended after since_id (if their older logs still match the
+    server's, see get_appended_map_logs), and the quests or geometry URL
+    whose version differs. If-None-Match with the last ETag gets a 304 when nothing changed.
+    Responses are assembled from pre-rendered JSON, nothing is serialized here.
+    """
+    state = cache.get(MAP_VERSIONS_CACHE_KEY)
+    if "since_id" not in request.GET or state is None:
+        # Full payload, for the first load and old clients
+        response = json_blob_response(request, 'map_refresh')
+        if response is not None:
+            return response
+        logger.warning('Daggerwalk map refresh blob cache miss')
+        return Response({
+            "logs": cache.get("daggerwalk_map_logs") or [],
+            "quests": cache.get("daggerwalk_map_quest") or [],
+            "geometry": cache.get("daggerwalk_map_geometry") or build_map_geometry(),
+            "logs_mode": "replace",
+        })
+
+    if request.headers.get("If-None-Match") == state['etag']:
+        response = HttpResponseNotModified()
+        response["ETag"] = state['etag']
+        return response
+
+    try:
+        since_id = int(request.GET.get("since_id") or 0)
+    except ValueError:
+        since_id = 0
+
+    versions = state['versions']
+    changed = [part for part in MAP_DATA_KEYS if request.GET.get(f"{part}_v") != versions[part]]
+    pieces = [b'"versions":' + state['versions_json']]
+    if changed:
+        parts = cache.get(MAP_PARTS_CACHE_KEY) or {'bodies': {}, 'log_ids': [], 'log_items': []}
+        for part in changed:
+            if part == 'logs':
+                new_logs = get_appended_map_logs(parts, request.GET.get("logs_v"), since_id)
+                if new_logs is not None:
+                    pieces.append(
+                        b'"logs":[' + b','.join(new_logs) + b'],"logs_mode":"append","logs_first_id":'
+                        + str(parts['log_ids'][0]).encode()
+                    )
+                else:
+                    pieces.append(b'"logs":' + parts['bodies'].get('logs', b'[]') + b',"logs_mode":"replace"')
+            else:
+                pieces.append(b'"' + part.encode() + b'":' + parts['bodies'].get(part, b'[]'))
+
+    response = HttpResponse(b'{' + b','.join(pieces) + b'}', content_type='application/json')
+    response["ETag"] = state['etag']
+    return response
+
+
+def daggerwalk_map_geometry(request, version):
+    """
+    The compact shapes/POIs blob (see map_geometry.py) at a URL that changes with its content,
+    so it's cached for good. Old versions redirect to the current one.
+    """
+    url = cache.get("daggerwalk_map_geometry") or build_map_geometry()
+    if url != reverse('daggerwalk_map_geometry', args=[version]):
+        response = redirect(url)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    response = json_blob_response(request, 'geometry')
+    if response is None:
+        logger.warning('Daggerwalk map geometry blob cache miss')
+        return HttpResponse(render_json(get_map_geometry()), content_type='application/json')
+    patch_cache_control(response, public=True, max_age=MAP_GEOMETRY_MAX_AGE, immutable=True)
+    return response
     
 
 class DaggerwalkHomeDataView(APIView):
     """View to fetch fresh cache data for the Daggerwalk home view"""
     permission_classes = [AllowAny]
     
-    @method_decorator(cache_control(no_cache=True, no_store=True, must_revalidate=True))
+    @method_decorator(cache_control(no_cache=True, must_revalidate=True))
     def get(self, request):
+        response = json_blob_response(request, 'home_data')
+        if response is not None:
+            return response
+
         data = {
             "region_data": cache.get("daggerwalk_region_data") or [],
             "latest_log_data": cache.get("daggerwalk_latest_log_data") or {}
@@ -110,107 +191,40 @@ def create_daggerwalk_log(request):
         return Response({"status": "error", "message": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
     try:
-        # Create the log (DaggerwalkLog.save links POI/Region if applicable)
-        log_entry = DaggerwalkLog.objects.create(
-            world_x=request.data['worldX'],
-            world_z=request.data['worldZ'],
-            map_pixel_x=request.data['mapPixelX'],
-            map_pixel_y=request.data['mapPixelY'],
-            region=request.data['region'],
-            location=request.data['location'],
-            player_x=request.data['playerX'],
-            player_y=request.data['playerY'],
-            player_z=request.data['playerZ'],
-            date=request.data['date'],
-            weather=request.data['weather'],
-            current_song=request.data.get('currentSong'),
-        )
-
-        # Create chat logs
-        raw_chat_logs = request.data.get("chat_logs") or []
-        if isinstance(raw_chat_logs, str):
-            raw_chat_logs = raw_chat_logs.strip().splitlines()
-
-        chat_logs_to_create = []
-        usernames = set()
-
-        for ln in raw_chat_logs:
-            parts = [p.strip() for p in ln.split("|")]
-            if len(parts) >= 3:
-                ts = parse_datetime(parts[0])
-                if ts:
-                    user = parts[1]
-                    usernames.add(user)
-                    chat_logs_to_create.append(ChatCommandLog(
-                        request_log=log_entry,
-                        timestamp=ts,
-                        user=user,
-                        command=parts[2],
-                        args=" ".join(parts[3:]) if len(parts) > 3 else "",
-                        raw=ln,
-                    ))
-
-        if chat_logs_to_create:
-            # Case-insensitive lookup: get or create profiles
-            profile_map = {}  # username_lower -> profile_id
-            
-            for uname in usernames:
-                uname_lower = uname.lower()
-                # Try case-insensitive lookup first
-                try:
-                    prof = TwitchUserProfile.objects.get(twitch_username__iexact=uname)
-                except TwitchUserProfile.DoesNotExist:
-                    # Create profile if it doesn't exist
-                    prof = TwitchUserProfile.objects.create(twitch_username=uname)
-                
-                profile_map[uname_lower] = prof.id
-            
-            # Assign profile IDs to chat logs
-            for obj in chat_logs_to_create:
-                pid = profile_map.get(obj.user.lower())
-                if pid:
-                    obj.profile_id = pid
-                    
-            ChatCommandLog.objects.bulk_create(chat_logs_to_create)
-
-        # Quest flow
-        quest_completed = False
-        completed_quest_payload = None
-
-        active_quest = (
-            Quest.objects
-            .filter(status="in_progress", poi__isnull=False)
-            .select_related("poi", "poi__region")
-            .order_by("-created_at")
-            .first()
-        )
-
-        # Complete if the log's resolved POI matches the active quest's POI
-        if active_quest and log_entry.poi_id and active_quest.poi_id == log_entry.poi_id:
-            completed_meta, active_quest = complete_and_rotate_quest(
-                active_quest,
-                completed_at=log_entry.created_at,
-                completion_request_log_id=log_entry.id,
-            )
-            quest_completed = True
-
-            # Resolve completed quest by id from meta and serialize it
-            completed_id = (completed_meta or {}).get("id")
-            if completed_id:
-                completed_quest_obj = (
+        # One transaction for the log, its chat logs and any quest rotation
+        with transaction.atomic():
+            log_entry = ingest_daggerwalk_log(request.data)
+
+            # Quest flow
+            quest_completed = False
+            completed_quest_payload = None
+            active_quest = get_active_quest()
+            current_quest_payload = active_quest['data']
+
+            # Complete if the log's resolved POI matches the active quest's POI
+            if active_quest['poi_id'] and log_entry.poi_id == active_quest['poi_id']:
+                quest = (
                     Quest.objects
                     .select_related("poi", "poi__region")
-                    .filter(pk=completed_id)
+                    .filter(pk=active_quest['id'], status="in_progress")
                     .first()
                 )
-                if completed_quest_obj:
-                    completed_quest_payload = QuestSerializer(completed_quest_obj).data
+                completed_meta, next_quest = complete_and_rotate_quest(
+                    quest,
+                    completed_at=log_entry.created_at,
+                    completion_request_log_id=log_entry.id,
+                ) if quest else (None, None)
+
+                if completed_meta:
+                    quest_completed = True
+                    completed_quest_payload = QuestSerializer(quest).data
+                    current_quest_payload = QuestSerializer(next_quest).data
 
-        # Serialize responses
-        log_payload = DaggerwalkLogSerializer(log_entry).data
-        current_quest_payload = QuestSerializer(active_quest).data if active_quest else None
+            # Serialize responses
+            log_payload = DaggerwalkLogSerializer(log_entry).data
 
-        update_all_daggerwalk_caches.delay()
+            transaction.on_commit(publish_latest_log)
+            transaction.on_commit(schedule_daggerwalk_cache_rebuild)
 
         return Response({
             "status": "success",
@@ -234,8 +248,20 @@ def create_daggerwalk_log(request):
 @permission_classes([AllowAny])
 def latest_log(request):
     """API endpoint to fetch the latest cached Daggerwalk log data"""
+    response = json_blob_response(request, 'latest_log')
+    if response is not None:
+        return response
     return Response(cache.get("daggerwalk_latest_log_data"))
-    
+
+
+def latest_log_stream(request):
+    """
+    The Daggerwalk live feed is served by the ASGI app (apps.daggerwalk.live.latest_log_stream_app),
+    where an idle viewer doesn't hold a thread. Requests only get here under WSGI: 204 tells
+    EventSource to stop reconnecting, and daggerwalk.js falls back to polling.
+    """
+    return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
 
 # API Views
 class RegionListAPIView(BaseListAPIView):
@@ -286,11 +312,16 @@ class DaggerwalkLogListAPIView(BaseListAPIView):
     
 
 class DaggerwalkStatsView(APIView):
-    template = 'daggerwalk/stats.html'
     permission_classes = [AllowAny]
 
+    @method_decorator(cache_control(no_cache=True, must_revalidate=True))
     def get(self, request):
         keyword = request.query_params.get('range', 'all')
+        # Pre-rendered (stats and panel HTML) by the cache rebuild, with an ETag for conditional GETs
+        response = json_blob_response(request, f'stats:{keyword}')
+        if response is not None:
+            return response
+
         stats = cache.get(f'daggerwalk_stats:{keyword}')
 
         if stats is None:
@@ -298,10 +329,7 @@ class DaggerwalkStatsView(APIView):
 
         data = {
             'stats': stats,
-            'html': render_to_string(self.template, {
-                'stats': stats, 
-                "today": timezone.localtime(timezone.now(), EST_TIMEZONE).date()
-            }),
+            'html': render_stats_html(stats),
         }
         return Response(data)
 
@@ -327,9 +355,14 @@ class QuestListAPIView(BaseListAPIView):
 @staff_member_required
 def build_daggerwalk_caches(request):
     if request.method == "POST":
-        update_all_daggerwalk_caches.delay()
-        # update_all_daggerwalk_caches()
-        messages.success(request, "Daggerwalk caches built successfully.")
+        schedule_daggerwalk_cache_rebuild(full_rebuild=True)
+        # rebuild_daggerwalk_caches(full_rebuild=True)
+        metrics = get_cache_rebuild_metrics()
+        messages.success(
+            request,
+            f"Daggerwalk cache rebuild queued. "
+            f"{metrics['collapsed']} of {metrics['requested']} rebuild requests have been collapsed so far."
+        )
     return redirect("admin:daggerwalk_daggerwalklog_changelist")
 
 
@@ -1,10 +1,15 @@
 from django.http import HttpResponseForbidden, HttpResponseRedirect
 from django.views.decorators.http import require_POST
 from django.core.cache import cache
+from apps.daggerwalk.cache_segments import DAGGERWALK_HOME_HTML_LAST_GOOD_CACHE_KEY
 
 @require_POST
 def clear_cache_view(request):
     if not request.user.is_superuser:
         return HttpResponseForbidden()
+    # Keep the Daggerwalk home page's last good copy so it can be served while its caches rebuild
+    last_good_html = cache.get(DAGGERWALK_HOME_HTML_LAST_GOOD_CACHE_KEY)
     cache.clear()
+    if last_good_html is not None:
+        cache.set(DAGGERWALK_HOME_HTML_LAST_GOOD_CACHE_KEY, last_good_html, timeout=None)
     return HttpResponseRedirect(request.META.get("HTTP_REFERER", "/admin/"))
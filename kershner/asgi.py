@@ -0,0 +1,27 @@
+"""
+ASGI config for kershner project.
+
+Serves the long-lived streaming endpoints (the Daggerwalk live feed) so they don't hold WSGI threads.
+Everything else is still served by the WSGI app in wsgi.py.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'site_config.settings.prod')
+
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from apps.daggerwalk.live import latest_log_stream_app  # noqa: E402
+
+STREAM_APPS = {
+    '/daggerwalk/logs/stream/': latest_log_stream_app,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] in STREAM_APPS:
+        return await STREAM_APPS[scope['path']](scope, receive, send)
+    return await django_application(scope, receive, send)
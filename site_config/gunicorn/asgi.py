@@ -0,0 +1,25 @@
+"""Gunicorn *production* config file for the ASGI app (long-lived streams like the Daggerwalk live feed)"""
+
+# Django ASGI application path in pattern MODULE_NAME:VARIABLE_NAME
+wsgi_app = "kershner.asgi:application"
+
+# One event loop holds every idle stream, so a single worker is plenty
+# (python manage.py loadtest_daggerwalk_stream to see how many)
+workers = 1
+worker_class = "uvicorn.workers.UvicornWorker"
+
+timeout = 60
+graceful_timeout = 10
+
+# The socket to bind
+bind = "127.0.0.1:8001"
+
+# Write access and error info to /var/log
+accesslog = "/var/log/gunicorn/asgi_access.log"
+errorlog = "/var/log/gunicorn/asgi_error.log"
+
+# Redirect stdout/stderr to log file
+capture_output = True
+
+# Don't daemonize, as we are monitoring Gunicorn with supervisor
+daemon = False
@@ -208,5 +208,7 @@ DAGGERWALK_TWITCH_BROADCASTER_ID = PARAMETERS['daggerwalk_twitch_broadcaster_id'
 DAGGERWALK_TWITCH_REFRESH_TOKEN = PARAMETERS['daggerwalk_twitch_refresh_token']
 
 PLAYWRIGHT_CHROMIUM_PATH = os.getenv("PLAYWRIGHT_CHROMIUM_PATH", "/opt/playwright-browsers/chromium-1181/chrome-linux/chrome")
+# Where the screenshot browser sends the Daggerwalk page's requests to the site, instead of out over the internet
+DAGGERWALK_SCREENSHOT_LOCAL_URL = os.getenv("DAGGERWALK_SCREENSHOT_LOCAL_URL", "http://127.0.0.1:8000")
 
 YOUTUBE_API_KEY = PARAMETERS['youtube_api_key']
\ No newline at end of file
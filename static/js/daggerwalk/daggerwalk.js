@@ -2,6 +2,7 @@ const daggerwalk = {
   latestLog: {},
   inOcean: false,
   pollInterval: null,
+  liveFeed: null,
   twitchPlayer: null,
 
   formatTime(dateStr) {
@@ -65,23 +66,17 @@ const daggerwalk = {
         }
     }
 
+    const buffer = 10000;  // 10s
     try {
-        const buffer = 10000;  // 10s  
         const response = await fetch('/daggerwalk/logs/latest/');
-        const responseJson = await response.json();
-        const newLog = JSON.parse(responseJson.log);
-        const inOcean = responseJson.in_ocean === 'true';
+        const newLog = this.applyLatest(await response.json());
 
         // Ensure created_at exists and is valid before scheduling the next fetch
-        if (!newLog.created_at) {
+        if (!newLog || !newLog.created_at) {
             this.scheduleNextFetch(buffer);
             return;
         }
 
-        this.latestLog = newLog;
-        this.inOcean = inOcean;
-        this.updateStatus();
-
         // Calculate the next fetch time based on the new log's created_at
         const newLogTime = new Date(newLog.created_at).getTime();
         const nextFetchTime = newLogTime + fiveMinutesAndBuffer;
@@ -93,6 +88,17 @@ const daggerwalk = {
     }
   },
 
+  applyLatest(responseJson) {
+    // Same shape from the latest log endpoint and the live feed: log is a JSON string, in_ocean is "true"/"false"
+    const newLog = JSON.parse(responseJson.log);
+    if (!newLog.created_at) return null;
+
+    this.latestLog = newLog;
+    this.inOcean = responseJson.in_ocean === 'true';
+    this.updateStatus();
+    return newLog;
+  },
+
   scheduleNextFetch(delay) {
       if (this.pollInterval) {
           clearTimeout(this.pollInterval);
@@ -111,6 +117,33 @@ const daggerwalk = {
       }
   },
 
+  startLiveFeed() {
+    // New logs are pushed over Server-Sent Events; fall back to polling if the feed isn't available
+    if (!window.EventSource) {
+      this.startPolling();
+      return;
+    }
+
+    const source = new EventSource('/daggerwalk/logs/stream/');
+    this.liveFeed = source;
+
+    source.addEventListener('log', (event) => {
+      try {
+        this.applyLatest(JSON.parse(event.data));
+      } catch (err) {
+        console.error('Bad Daggerwalk live feed event', err);
+      }
+    });
+
+    // EventSource reconnects by itself; it only closes for good when the server turns it away
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) {
+        this.liveFeed = null;
+        this.startPolling();
+      }
+    };
+  },
+
   siteMenu() {
     const toggle = document.querySelector('.menu-toggle');
     const menuContainer = document.querySelector('.menu-container');
@@ -532,7 +565,7 @@ daggerwalk.init = () => {
   daggerwalk.handleAboutTabParameter();
   daggerwalk.initAboutTabs();
   daggerwalk.updateStatus();
-  daggerwalk.startPolling();
+  daggerwalk.startLiveFeed();
   daggerwalk.siteMenu();
   daggerwalk.initTables();
   daggerwalk.initDaggerwalkStats();
@@ -14,6 +14,9 @@ let map, poiLayer, logLayer, questLayer, regionShapeLayer;
 let CURRENT_LOG_TYPE_FILTER = "default";
 let logLineLayer = null;
 
+// Set as each part of the map finishes, so the screenshot service (apps/daggerwalk/screenshots.py) can wait on them
+window.daggerwalkMapReady = { baseImage: false, layers: false, geometry: false };
+
 /* -------------------- Map Setup -------------------- */
 function setupMap() {
   const imgBounds = (bounds instanceof L.LatLngBounds) ? bounds : L.latLngBounds(bounds);
@@ -44,6 +47,7 @@ function setupMap() {
   });
 
   const imageLayer = L.imageOverlay(imageUrl, imgBounds).addTo(map);
+  imageLayer.once('load', () => { window.daggerwalkMapReady.baseImage = true; });
   map.baseImageLayer = imageLayer;
   map.fitBounds(imgBounds);
   map.setMaxBounds(imgBounds.pad(0.5));
@@ -61,13 +65,69 @@ function isAltMapActive() {
 
 function getMapData() {
   return {
-    pois: JSON.parse(document.getElementById('poi-data').textContent),
     logs: JSON.parse(document.getElementById('logs-data').textContent),
     quests: JSON.parse(document.getElementById('quest-data').textContent),
-    shapes: JSON.parse(document.getElementById('shape-data').textContent),
   };
 }
 
+/* -------------------- Geometry (shapes + POIs) -------------------- */
+// Shapes and POIs come from a content-hashed URL (see map_geometry.py) that the browser caches for good
+function decodePolyline(encoded) {
+  const values = [];
+  let value = 0, shift = 0;
+  for (let i = 0; i < encoded.length; i++) {
+    const chunk = encoded.charCodeAt(i) - 63;
+    value |= (chunk & 0x1f) << shift;
+    shift += 5;
+    if (chunk < 0x20) {
+      values.push(value & 1 ? ~(value >> 1) : value >> 1);
+      value = 0;
+      shift = 0;
+    }
+  }
+  return values;
+}
+
+function expandMapGeometry(data) {
+  const toObject = (fields, row) => Object.fromEntries(fields.map((field, i) => [field, row[i]]));
+  const regions = data.regions.map(row => toObject(data.region_fields, row));
+  const [originX, originY] = data.origin;
+
+  const shapes = data.shapes.map(([regionIndex, encoded]) => {
+    const deltas = decodePolyline(encoded);
+    const coordinates = [];
+    let x = 0, y = 0;
+    for (let i = 0; i < deltas.length; i += 2) {
+      x += deltas[i];
+      y += deltas[i + 1];
+      coordinates.push([originX + x * data.step, originY + y * data.step]);
+    }
+    const region = regions[regionIndex];
+    return { name: region.name, province: region.province, coordinates };
+  });
+
+  const pois = data.pois.map(row => {
+    const poi = toObject(data.poi_fields, row);
+    poi.region = regions[poi.region];
+    return poi;
+  });
+  return { shapes, pois };
+}
+
+async function loadMapGeometry(url) {
+  const res = await fetch(url);
+  if (!res.ok) throw new Error("Failed to load map geometry");
+  const { shapes, pois } = expandMapGeometry(await res.json());
+
+  window.shapes = shapes;
+  window.SHAPE_EXTENTS = computeShapeExtents(shapes);
+  if (poiLayer && map.hasLayer(poiLayer)) map.removeLayer(poiLayer);
+  poiLayer = buildLayer(pois, { isPOI: true });
+  if (document.getElementById("toggle-pois").checked && !isAltMapActive()) map.addLayer(poiLayer);
+  if (document.getElementById("toggle-shapes").checked) drawRegionShapes(true);
+  window.daggerwalkMapReady.geometry = true;
+}
+
 function computeShapeExtents(shapes) {
   let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
   shapes.forEach(s => s.coordinates.forEach(([x, y]) => {
@@ -499,36 +559,64 @@ function handleZoomImageSwap(map) {
 }
 
 /* -------------------- Data Refresh / Filters -------------------- */
+const MAP_DATA_PARTS = ['logs', 'quests', 'geometry'];
+let mapVersions = null;
+let mapDataEtag = null;
+
+function getMapVersions() {
+  if (!mapVersions) {
+    const el = document.getElementById('map-versions');
+    mapVersions = el ? JSON.parse(el.textContent) : {};
+  }
+  return mapVersions;
+}
+
+function getLatestLogId(logs) {
+  return logs.reduce((max, log) => Math.max(max, log.id), 0);
+}
+
 async function refreshMapData() {
   const btn = document.getElementById("refresh-map");
   btn.disabled = true;
   btn.textContent = "...";
 
   try {
-    const res = await fetch(refreshDataUrl);
+    // Ask only for what changed since the data we already have
+    const current = getMapData();
+    const versions = getMapVersions();
+    const params = new URLSearchParams({ since_id: getLatestLogId(current.logs) });
+    MAP_DATA_PARTS.forEach(part => params.set(`${part}_v`, versions[part] || ''));
+
+    const headers = mapDataEtag ? { 'If-None-Match': mapDataEtag } : {};
+    const res = await fetch(`${refreshDataUrl}?${params}`, { headers, cache: 'no-store' });
+    if (res.status === 304) return;
     if (!res.ok) throw new Error("Failed to refresh map data");
     const data = await res.json();
+    mapDataEtag = res.headers.get('ETag');
+    mapVersions = data.versions;
+
+    if (data.logs) {
+      // An append comes with the id of the server's oldest log - anything older has left the map's window
+      const logs = data.logs_mode === "append"
+        ? current.logs.filter(log => log.id >= data.logs_first_id).concat(data.logs)
+        : data.logs;
+      document.getElementById("logs-data").textContent = JSON.stringify(logs);
+      rebuildLogLayer(logs);
+    }
 
-    document.getElementById("logs-data").textContent = JSON.stringify(data.logs);
-    document.getElementById("poi-data").textContent = JSON.stringify(data.pois);
-    document.getElementById("quest-data").textContent = JSON.stringify(data.quests);
-    document.getElementById("shape-data").textContent = JSON.stringify(data.shapes);
-
-    [logLayer, poiLayer, questLayer].forEach(layer => map.hasLayer(layer) && map.removeLayer(layer));
-
-    poiLayer = buildLayer(data.pois, { isPOI: true });
-    rebuildLogLayer(data.logs);
-    questLayer = buildLayer(data.quests, { isQuest: true });
+    if (data.quests) {
+      document.getElementById("quest-data").textContent = JSON.stringify(data.quests);
+      if (map.hasLayer(questLayer)) map.removeLayer(questLayer);
+      questLayer = buildLayer(data.quests, { isQuest: true });
+      if (document.getElementById("toggle-quest").checked) map.addLayer(questLayer);
+    }
 
-    if (document.getElementById("toggle-quest").checked) map.addLayer(questLayer);
-    if (document.getElementById("toggle-pois").checked) map.addLayer(poiLayer);
+    if (data.geometry) {
+      await loadMapGeometry(data.geometry);
+    }
 
     filterLogsByDate();
     applyLogTypeFilter();
-
-    if (document.getElementById("toggle-shapes").checked) {
-      drawRegionShapes(true);
-    }
   } catch (err) {
     console.error("Refresh failed:", err);
   } finally {
@@ -642,14 +730,11 @@ function daggerwalkMapInit() {
   window.daggerwalkMap = map;
   handleZoomImageSwap(map);
 
-  const { pois, logs, quests, shapes } = getMapData();
-  window.shapes = shapes;
-  window.SHAPE_EXTENTS = computeShapeExtents(window.shapes || []);
+  const { logs, quests } = getMapData();
 
   const latest = logs.reduce((a, b) =>
     new Date(a.created_at) > new Date(b.created_at) ? a : b, logs[0]);
 
-  poiLayer  = buildLayer(pois,  { isPOI: true });
   logLayer  = buildLayer(logs,  { highlightId: latest.id });
   questLayer = buildLayer(quests, { isQuest: true });
 
@@ -670,4 +755,8 @@ function daggerwalkMapInit() {
   map.on('moveend', applyLogTypeFilter);
 
   filterLogsByDate();
+  window.daggerwalkMapReady.layers = true;
+
+  loadMapGeometry(document.getElementById('map').dataset.geometryUrl)
+    .catch(err => console.error("Map geometry failed:", err));
 }